@@ -0,0 +1,128 @@
+# chatgpt_clone/loadtest/mock_openai.py
+"""
+Mock OpenAI Server - OpenAI-compatible /v1/embeddings and /v1/chat/completions
+
+Latency is simulated, not burned: each request sleeps for
+    embeddings:        --embed-latency-ms
+    chat completions:  --chat-latency-ms (time to first token)
+                       + --completion-tokens / --tokens-per-sec
+so one process can stand in for a slow upstream under high concurrency.
+Embeddings are deterministic unit vectors (same text → same vector).
+Also the stub server for tests/test_openai_client.py (--rate-limit-first N
+answers the first N requests with 429 + Retry-After).
+
+Run from job-assistant-backend/:
+    python -m loadtest.mock_openai --port 9100 --dim 1536 --chat-latency-ms 800
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(dim: int = 1536, embed_latency_ms: float = 80, chat_latency_ms: float = 800,
+               tokens_per_sec: float = 60, completion_tokens: int = 300, error_rate: float = 0.0,
+               rate_limit_first: int = 0, retry_after: float = 0.5) -> FastAPI:
+    app = FastAPI()
+    stats = {"embeddings": 0, "chat_completions": 0, "rate_limited": 0}
+    app.state.stats = stats
+
+    def fake_embedding(text: str) -> list:
+        seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def maybe_rate_limit():
+        deterministic = stats["rate_limited"] < rate_limit_first
+        if deterministic or (error_rate and random.random() < error_rate):
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(retry_after)},
+                content={"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+            )
+        return None
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        if (error := maybe_rate_limit()) is not None:
+            return error
+        stats["embeddings"] += 1
+        await asyncio.sleep(embed_latency_ms / 1000)
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": body.get("model", "text-embedding-3-small"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(text))}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if (error := maybe_rate_limit()) is not None:
+            return error
+        stats["chat_completions"] += 1
+        await asyncio.sleep(chat_latency_ms / 1000 + completion_tokens / tokens_per_sec)
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+        content = "Here are the matching jobs:\n\n" + "\n".join(
+            f"{i + 1}. **Mock Job {i + 1}** - a good match." for i in range(5)
+        )
+        return {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension (match the index!)")
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--chat-latency-ms", type=float, default=800, help="Time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=60, help="Completion token throughput")
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-limit-first", type=int, default=0, help="Answer the first N requests with 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    app = create_app(args.dim, args.embed_latency_ms, args.chat_latency_ms,
+                     args.tokens_per_sec, args.completion_tokens, args.error_rate,
+                     args.rate_limit_first, args.retry_after)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# chatgpt_clone/loadtest/run_load.py
+"""
+Load Harness - Closed-loop load test of the backend against a mock OpenAI
+
+1. Starts loadtest.mock_openai (configurable latency / token throughput)
+2. Starts main.py under uvicorn with OPENAI_BASE_URL pointing at the mock
+3. For each concurrency step, N workers loop "send request → wait for reply →
+   send next" for --step-seconds, over a realistic mix of:
+      chat       POST /chat                    (embed + search + GPT)
+      chat_fast  POST /chat {"return_all": true} (embed + search only)
+      jobs       GET  /jobs                    (browse / keyword search)
+4. Reports throughput, p50/p95/p99 latency, error rate and the server's
+   event-loop lag (from /stats) per step
+
+Run from job-assistant-backend/:
+    python -m loadtest.run_load --concurrency 1,4,16,64 --step-seconds 20
+    python -m loadtest.run_load --base-url http://127.0.0.1:8000   # existing server, no spawning
+    python -m loadtest.run_load --deadline-ms 2000   # per-request /chat budget (degradation in output)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import numpy as np
+
+
+SKILLS = ["Python", "Java", "React", "TypeScript", "Go", "AWS", "Kubernetes", "machine learning",
+          "data engineering", "Node", "Django", "Scala", "DevOps", "frontend", "backend"]
+CITIES = ["London", "Manchester", "Edinburgh", "Bristol", "Leeds", "Cambridge", "remote"]
+TEMPLATES = [
+    "{skill} jobs in {city}",
+    "Find {skill} developer roles in {city} paying over £{salary}k",
+    "Senior {skill} engineer positions with visa sponsorship",
+    "Show me {skill} jobs",
+    "{skill} roles in {city} between £{salary}k and £{salary_max}k",
+    "Entry level {skill} jobs in {city}",
+]
+BROWSE_TERMS = [None, None, "python", "engineer", "react", "data", "senior", "aws"]
+
+
+def build_query_pool(size: int = 300, seed: int = 7) -> list:
+    """Realistic queries; popular ones repeat (Zipf-weighted sampling) like real traffic"""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(size):
+        salary = rng.choice([40, 50, 60, 70, 80, 90])
+        pool.append(rng.choice(TEMPLATES).format(
+            skill=rng.choice(SKILLS), city=rng.choice(CITIES), salary=salary, salary_max=salary + 20
+        ))
+    return pool
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        kind, weight = part.split("=")
+        weights[kind.strip()] = float(weight)
+    return weights
+
+
+# ==========================================
+# PROCESSES
+# ==========================================
+
+def wait_until_ready(url: str, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def index_dimension() -> int:
+    """The mock must return embeddings with the same dimension as the index"""
+    from rag.retriever import load_index_info
+    return int(load_index_info().get("dimension", 1536))
+
+
+def start_processes(args):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "loadtest.mock_openai", "--port", str(args.mock_port),
+         "--dim", str(args.dim or index_dimension()),
+         "--embed-latency-ms", str(args.embed_latency_ms),
+         "--chat-latency-ms", str(args.chat_latency_ms),
+         "--tokens-per-sec", str(args.tokens_per_sec),
+         "--completion-tokens", str(args.completion_tokens),
+         "--error-rate", str(args.mock_error_rate)],
+        cwd=backend_dir,
+    )
+
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "OPENAI_API_KEY": "mock-key",
+        "PROFILE_DB_PATH": os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "profiles.db"),
+    })
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(args.api_port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+
+    wait_until_ready(f"http://127.0.0.1:{args.mock_port}/stats")
+    wait_until_ready(f"http://127.0.0.1:{args.api_port}/health/ready")
+    return [server, mock]
+
+
+# ==========================================
+# CLOSED-LOOP DRIVER
+# ==========================================
+
+def make_request(kind: str, rng: random.Random, queries: list, weights: np.ndarray):
+    """(method, path, json body) for one request of the given kind"""
+    if kind == "jobs":
+        term = rng.choice(BROWSE_TERMS)
+        params = f"?page={rng.randint(1, 3)}&limit=50" + (f"&search={term}" if term else "")
+        return "GET", "/jobs" + params, None
+
+    query = queries[int(np.searchsorted(weights, rng.random()))]
+    return "POST", "/chat", {"message": query, "return_all": kind == "chat_fast"}
+
+
+async def worker(client, deadline, mix_kinds, mix_cum, queries, query_cum, results, seed):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        kind = mix_kinds[int(np.searchsorted(mix_cum, rng.random()))]
+        method, path, body = make_request(kind, rng, queries, query_cum)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        results.append((kind, (time.perf_counter() - started) * 1000, ok))
+
+
+def summarize(kind: str, samples: list, seconds: float) -> dict:
+    latencies = np.array([ms for _, ms, _ in samples]) if samples else np.zeros(1)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    return {
+        "kind": kind,
+        "requests": len(samples),
+        "rps": len(samples) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "error_rate": errors / len(samples) if samples else 0.0,
+    }
+
+
+async def run_step(base_url: str, concurrency: int, seconds: float, mix: dict, queries: list,
+                   deadline_ms: float = None) -> dict:
+    mix_kinds = list(mix)
+    mix_cum = np.cumsum([mix[k] for k in mix_kinds]) / sum(mix.values())
+    zipf = 1.0 / np.arange(1, len(queries) + 1)
+    query_cum = np.cumsum(zipf) / zipf.sum()
+
+    results = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"X-Request-Deadline-Ms": str(deadline_ms)} if deadline_ms else None
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0, headers=headers) as client:
+        started = time.perf_counter()
+        deadline = started + seconds
+        await asyncio.gather(*[
+            worker(client, deadline, mix_kinds, mix_cum, queries, query_cum, results, seed=i)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+        # Server-side event-loop lag over this step's window
+        stats = (await client.get("/stats", params={"lag_window": elapsed})).json()
+
+    step = {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "all": summarize("all", results, elapsed),
+        "by_kind": [summarize(k, [r for r in results if r[0] == k], elapsed) for k in mix_kinds],
+        "event_loop_lag_ms": stats.get("event_loop_lag_ms", {}),
+        "chat_deadline": stats.get("chat_deadline", {}),  # Cumulative since server start
+    }
+    return step
+
+
+def print_step(step: dict):
+    lag = step["event_loop_lag_ms"]
+    for row in [step["all"]] + step["by_kind"]:
+        print(f"{step['concurrency']:>5} {row['kind']:<10} {row['requests']:>7} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+              f"{row['error_rate'] * 100:>6.1f}%"
+              + (f" {lag.get('p99', 0):>8.1f} {lag.get('max', 0):>8.1f}" if row["kind"] == "all" else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test with a mock OpenAI server")
+    parser.add_argument("--base-url", help="Test an already running server instead of spawning one")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--dim", type=int, help="Mock embedding dimension (default: from the index)")
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--tokens-per-sec", type=float, default=60)
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Ramp steps")
+    parser.add_argument("--step-seconds", type=float, default=20)
+    parser.add_argument("--mix", default="chat=0.2,chat_fast=0.5,jobs=0.3")
+    parser.add_argument("--deadline-ms", type=float, help="Send X-Request-Deadline-Ms with every request")
+    parser.add_argument("--json-out", help="Also write all step results to this file")
+    args = parser.parse_args()
+
+    processes = [] if args.base_url else start_processes(args)
+    base_url = args.base_url or f"http://127.0.0.1:{args.api_port}"
+    mix = parse_mix(args.mix)
+    queries = build_query_pool()
+
+    print(f"🚦 Load test against {base_url} (mix: {mix})\n")
+    print(f"{'conc':>5} {'kind':<10} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'lag p99':>8} {'lag max':>8}")
+
+    steps = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            step = asyncio.run(run_step(base_url, concurrency, args.step_seconds, mix, queries, args.deadline_ms))
+            steps.append(step)
+            print_step(step)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    if steps and steps[-1]["chat_deadline"]:
+        deadline = steps[-1]["chat_deadline"]
+        print(f"\n⏳ /chat summaries degraded to fast mode: {deadline['degraded']}/{deadline['summary_requests']} "
+              f"({deadline['degradation_rate'] * 100:.1f}%)")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(steps, f, indent=2)
+        print(f"\n💾 Results written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
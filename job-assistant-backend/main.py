@@ -1,26 +1,216 @@
 # chatgpt_clone/main.py
-from fastapi import FastAPI, Request, Query
+import time
+_process_started = time.perf_counter()
+
+from fastapi import FastAPI, Request, Query, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from rag.retriever import load_faiss_index
-from rag.embedder import embed_text
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+# faiss / openai are imported lazily inside these modules, so importing them is cheap
+from rag.retriever import load_faiss_index, load_index_info, load_job_vectors, get_index_version, default_index_path
+from rag.embedder import QueryEmbeddingCache, embed_text, get_embedder, set_default_embedder
+from rag.openai_client import get_openai_client, peek_openai_client, DeadlineExceeded
+from rag.scoring import CandidateScorer, ScoringWeights
+from rag.similar_jobs import SimilarJobsTable, knn_table_path
+from rag.profile_store import ProfileStore, build_profile, profile_embedding_text, profile_scores
+from rag.job_agent import JobAgent
+from rag.aggregates import SalaryCube, aggregates_path, format_comparison
 import numpy as np
-import openai
+import asyncio
 import os
 import hashlib
-from functools import lru_cache
-from typing import Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Iterable, Union
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai_client = openai.OpenAI()  # If you're using `openai>=1.0.0`
+# ⏱️ Startup phases (ms) - reported by /health/ready and /stats
+startup_timings = {"imports": (time.perf_counter() - _process_started) * 1000}
+startup_error = None
+index_ready = False
+
+# Filled in by the background loader (see load_index_in_background)
+faiss_index = None
+metadata = []
+index_version = None
+index_info = {}
+query_embedder = None
+job_vectors = None
+similar_jobs = None
+candidate_scorer = None
+job_agent = None
+salary_cube = None
+
+
+def _timed_phase(name: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    startup_timings[name] = (time.perf_counter() - started) * 1000
+    print(f"⏱️  Startup phase '{name}': {startup_timings[name]:.0f} ms")
+    return result
+
+
+def load_index():
+    """
+    Load everything the search endpoints need. Runs in a worker thread after
+    uvicorn is already accepting connections; /health/ready flips to 200 when done.
+    """
+    global faiss_index, metadata, index_version, index_info, query_embedder
+    global job_vectors, similar_jobs, candidate_scorer, job_agent, salary_cube, index_ready
+
+    # Load FAISS index and metadata
+    loaded_index, loaded_metadata = _timed_phase("load_index", load_faiss_index)
+    loaded_info = load_index_info()
+    # Embed queries with the same backend the index was built with
+    loaded_embedder = _timed_phase("embedder", lambda: get_embedder(loaded_info.get("embedder")))
+    # Job vectors (memory-mapped) for local, API-free re-ranking
+    loaded_vectors = _timed_phase("load_vectors", lambda: load_job_vectors(index=loaded_index))
+
+    def load_similar_jobs():
+        # Precomputed k-NN "similar jobs" table (None if the build skipped it)
+        table = SimilarJobsTable.load(knn_table_path(default_index_path()))
+        if table is not None and table.num_jobs > len(loaded_metadata):
+            print(f"⚠️  Ignoring stale similar-jobs table ({table.num_jobs} rows, index has {len(loaded_metadata)} jobs)")
+            return None  # Left over from a bigger index - its ids point past metadata
+        if table is not None and table.num_jobs < len(loaded_metadata) and loaded_vectors is not None:
+            table = table.extend(loaded_vectors)  # Jobs were appended without refreshing the table
+        return table
+
+    loaded_similar = _timed_phase("similar_jobs", load_similar_jobs)
+
+    def load_aggregates():
+        # Salary cube for comparison queries - extended (or built) if the index has more jobs
+        cube = SalaryCube.load(aggregates_path(default_index_path()))
+        if cube is None or cube.num_jobs > len(loaded_metadata):
+            cube = SalaryCube()
+        return cube.extend(loaded_metadata)
+
+    loaded_cube = _timed_phase("aggregates", load_aggregates)
+    # Per-job keyword features precomputed once for vectorized scoring in /chat
+    loaded_scorer = _timed_phase("scorer", lambda: CandidateScorer(loaded_metadata, ScoringWeights.from_env()))
+    loaded_version = _timed_phase("index_version", get_index_version)  # Changes on every rebuild, used for ETags
+    # Create the shared OpenAI client here (imports openai/httpx) rather than on
+    # the event loop during the first /chat - optional, never blocks readiness
+    _timed_phase("openai_client", warm_openai_client)
+
+    # Publish everything at once
+    faiss_index, metadata, index_info = loaded_index, loaded_metadata, loaded_info
+    query_embedder, job_vectors, similar_jobs = loaded_embedder, loaded_vectors, loaded_similar
+    candidate_scorer, index_version, salary_cube = loaded_scorer, loaded_version, loaded_cube
+    set_default_embedder(query_embedder)
+    # 🤖 Agentic search (/agent-chat) shares the index and the query-embedding cache
+    job_agent = JobAgent(
+        faiss_index, metadata,
+        embed_fn=cached_query_vector,
+        latency_budget_ms=AGENT_SEARCH_BUDGET_MS,
+        aggregates=salary_cube
+    )
+
+    # 🔥 Optional warm-up: replay recorded queries to fill the embedding cache,
+    # open pooled connections and page in the hot parts of the index
+    warmup_path = os.getenv("WARMUP_QUERIES_PATH")
+    if warmup_path:
+        _timed_phase("warmup", lambda: warm_up(warmup_path))
+
+    index_ready = True
+
+
+def warm_openai_client():
+    """
+    Best-effort: hashing/onnx indexes serve /jobs, /similar, /compare and
+    /agent-chat without OpenAI, so missing credentials must not fail the load
+    """
+    try:
+        get_openai_client()
+    except Exception as e:
+        print(f"⚠️  OpenAI client not created ({type(e).__name__}: {e}) - "
+              f"only endpoints that call OpenAI will fail")
+
+
+def warm_up(path: str, limit: int = 200):
+    """
+    Embed + search each recorded query (one per line); failures don't block readiness.
+    Runs inside load_index, i.e. in the loader's worker thread - never on the event loop.
+    """
+    if not os.path.exists(path):
+        print(f"⚠️  Warm-up file not found: {path}")
+        return
+    with open(path) as f:
+        queries = list(dict.fromkeys(line.strip() for line in f if line.strip()))[-limit:]
+
+    for query in queries:
+        try:
+            vector = cached_query_vector(query)
+            faiss_index.search(np.array([vector]).astype("float32"), k=min(MAX_GPT_CONTEXT_RESULTS * 3, faiss_index.ntotal))
+            candidate_scorer.score(query)
+        except Exception as e:
+            print(f"⚠️  Warm-up query failed ({query!r}): {e}")
+            break  # Most likely the embedding API is unreachable - don't stall startup
+    print(f"🔥 Warmed up with {len(queries)} recorded queries")
 
-# Load FAISS index and metadata on startup
-faiss_index, metadata = load_faiss_index()
 
-app = FastAPI()
+async def load_index_in_background():
+    global startup_error
+    try:
+        await asyncio.to_thread(load_index)
+        startup_timings["total"] = (time.perf_counter() - _process_started) * 1000
+        print(f"✅ Index ready ({len(metadata)} jobs) after {startup_timings['total']:.0f} ms")
+    except Exception as e:
+        startup_error = f"{type(e).__name__}: {e}"
+        print(f"❌ Index load failed: {startup_error}")
+
+
+# 🐢 Event-loop lag: how late a 100 ms sleep wakes up. Anything blocking the loop
+# (sync work in async handlers) shows up here - reported by /stats
+LOOP_LAG_INTERVAL = 0.1  # seconds
+loop_lag_samples = deque(maxlen=6000)  # (monotonic time, lag ms) - ~10 minutes
+
+
+async def monitor_event_loop_lag():
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag_ms = (time.perf_counter() - started - LOOP_LAG_INTERVAL) * 1000
+        loop_lag_samples.append((time.monotonic(), max(lag_ms, 0.0)))
+
+
+def event_loop_lag_summary(window_seconds: float) -> dict:
+    cutoff = time.monotonic() - window_seconds
+    lags = [lag for sampled_at, lag in loop_lag_samples if sampled_at >= cutoff]
+    if not lags:
+        return {"samples": 0}
+    return {
+        "samples": len(lags),
+        "p50": float(np.percentile(lags, 50)),
+        "p99": float(np.percentile(lags, 99)),
+        "max": max(lags)
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loader = asyncio.create_task(load_index_in_background())
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    yield
+    loader.cancel()
+    lag_monitor.cancel()
+    if hasattr(faiss_index, "close"):
+        faiss_index.close()  # Stop local shard processes
+
+
+def require_index():
+    """503 until the background loader has finished (clients/LBs should retry)"""
+    if not index_ready:
+        detail = f"Index failed to load: {startup_error}" if startup_error else "Index is still loading"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+
+# orjson serializes large job lists several times faster than the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -31,30 +221,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large bodies (job lists with descriptions compress ~5-10x).
+# Brotli is used when the optional `brotli-asgi` package is installed,
+# falling back to gzip for clients that don't accept `br`.
+COMPRESSION_MIN_SIZE = 1024  # bytes - smaller bodies aren't worth the CPU
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
 # Constants
 MAX_GPT_CONTEXT_RESULTS = 20  # Limit results sent to GPT to prevent context overflow
+MAX_AGENT_RESULTS = 100  # Upper bound for /agent-chat top_k
+# /agent-chat stops widening its candidate search once the next step would exceed this
+AGENT_SEARCH_BUDGET_MS = float(os.getenv("AGENT_SEARCH_BUDGET_MS", "250"))
+
+# ⏳ /chat latency budget: embed → search → GPT must finish within it, otherwise
+# the retrieved jobs are returned in fast mode with `summary_skipped: true`.
+# Per request: `X-Request-Deadline-Ms` header (0 = no deadline)
+CHAT_LATENCY_BUDGET_MS = float(os.getenv("CHAT_LATENCY_BUDGET_MS", "20000"))
+CHAT_MIN_SUMMARY_MS = float(os.getenv("CHAT_MIN_SUMMARY_MS", "1500"))  # Don't start GPT with less left
+DEADLINE_HEADER = "x-request-deadline-ms"
+chat_deadline_stats = {
+    "summary_requests": 0,    # /chat calls that wanted a GPT summary and got through retrieval
+    "summaries": 0,           # ...and got one
+    "skipped_before_gpt": 0,  # budget too small to start GPT
+    "gpt_timeouts": 0,        # GPT didn't answer in time
+    "embed_timeouts": 0,      # budget ran out before the query was embedded (504)
+    "search_timeouts": 0      # budget ran out before the vector search (504)
+}
+
+# Persistent user profiles (SQLite, shared across workers and restarts)
+profile_store = ProfileStore()
 
-# In-memory user profile storage (in production, use Redis or database)
-user_profiles = {}
+# Cache for query embeddings (stores up to 1024 unique queries) - repeated
+# queries skip the embedding call entirely; warm-up pre-fills it.
+# cached_query_vector(query, timeout=...) bounds a miss's embedding call
+cached_query_vector = QueryEmbeddingCache(maxsize=1024)
 
-# Cache for FAISS search results (stores up to 128 unique queries)
-@lru_cache(maxsize=128)
-def cached_search(query_hash: str, k: int):
-    """Cache FAISS search results based on query hash"""
-    # This is a wrapper - actual search happens in the endpoint
-    # We'll use this to cache the query hash
-    return query_hash
+def record_query(query: str):
+    """Append /chat queries to RECORD_QUERIES_PATH so they can be replayed as warm-up"""
+    record_path = os.getenv("RECORD_QUERIES_PATH")
+    if record_path:
+        with open(record_path, "a") as f:
+            f.write(query.replace("\n", " ") + "\n")
+
+async def load_profile(user_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+    """
+    Saved profile for /chat re-ranking. SQLite runs in a worker thread; an
+    embedding made by a different embedder than the index's (backend switched,
+    index rebuilt) is re-embedded once and stored again. If that doesn't fit
+    in `timeout`, this request just re-ranks without profile similarity.
+    """
+    profile = await run_in_threadpool(profile_store.get, user_id)
+    if not profile or profile.get("embedder") == query_embedder.config():
+        return profile
+
+    profile_text = profile_embedding_text(profile)
+    try:
+        embedding = await run_in_threadpool(embed_text, profile_text, timeout) if profile_text else None
+    except DeadlineExceeded:
+        profile["embedding"] = None
+        return profile
+    stored = {key: value for key, value in profile.items() if key not in ("embedding", "embedder")}
+    await run_in_threadpool(profile_store.save, user_id, stored, embedding, query_embedder.config())
+    profile["embedding"] = np.asarray(embedding, dtype="float32") if embedding is not None else None
+    profile["embedder"] = query_embedder.config()
+    return profile
+
+def parse_fields(fields: Union[str, Iterable[str], None]) -> Optional[list]:
+    """
+    Parse a field projection - either "title,company,salary" or a list.
+    Returns None when no projection was requested (return full jobs).
+    """
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    parsed = [f.strip() for f in fields if isinstance(f, str) and f.strip()]
+    return parsed or None
+
+def project_fields(jobs: list, fields: Optional[list]) -> list:
+    """Keep only the requested fields of each job (e.g. drop full_description)"""
+    if not fields:
+        return jobs
+    return [{f: job[f] for f in fields if f in job} for job in jobs]
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match check: exact match against each listed tag, or "*".
+    Weak comparison (RFC 7232) - a W/ prefix is ignored on both sides.
+    """
+    def opaque(tag: str) -> str:
+        return tag[2:] if tag.startswith("W/") else tag
+
+    for tag in (t.strip() for t in if_none_match.split(",")):
+        if tag == "*" or (tag and opaque(tag) == opaque(etag)):
+            return True
+    return False
 
 @app.get("/jobs")
 async def get_jobs(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
     limit: int = Query(50, ge=1, le=100, description="Number of jobs per page"),
-    search: Optional[str] = Query(None, description="Optional search term to filter jobs")
+    search: Optional[str] = Query(None, description="Optional search term to filter jobs"),
+    fields: Optional[str] = Query(None, description="Comma-separated job fields to return, e.g. title,company,salary")
 ):
     """
     Get paginated list of all jobs without GPT processing.
     Fast endpoint for browsing all available positions.
+    Supports ETag / If-None-Match: the response only changes when the index is rebuilt.
     """
+    require_index()
+
+    # 🏷️ ETag = index snapshot version + the query that shaped this page
+    etag_key = f"{index_version}:{page}:{limit}:{search}:{fields}"
+    etag = f'W/"{hashlib.md5(etag_key.encode()).hexdigest()}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=cache_headers)
+
     total_jobs = len(metadata)
     
     # Optional filtering by search term
@@ -75,9 +363,9 @@ async def get_jobs(
     end_idx = start_idx + limit
     
     # Get page of results
-    page_results = filtered_jobs[start_idx:end_idx]
+    page_results = project_fields(filtered_jobs[start_idx:end_idx], parse_fields(fields))
     
-    return {
+    return ORJSONResponse(headers=cache_headers, content={
         "results": page_results,
         "total": total_filtered,
         "page": page,
@@ -85,17 +373,89 @@ async def get_jobs(
         "total_pages": (total_filtered + limit - 1) // limit,
         "has_next": end_idx < total_filtered,
         "has_prev": page > 1
+    })
+
+@app.get("/jobs/{job_id}/similar")
+async def get_similar_jobs(
+    job_id: int,
+    limit: int = Query(10, ge=1, le=50, description="Number of similar jobs"),
+    fields: Optional[str] = Query(None, description="Comma-separated job fields to return")
+):
+    """
+    Jobs most similar to `job_id`, straight from the precomputed k-NN table
+    (no embedding, no vector search - a single row lookup).
+    """
+    require_index()
+    if similar_jobs is None:
+        raise HTTPException(status_code=503, detail="Similar jobs table not built - rerun build_index")
+    if not 0 <= job_id < similar_jobs.num_jobs:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    neighbours = similar_jobs.lookup(job_id, limit)
+    jobs = project_fields([metadata[i] for i, _ in neighbours], parse_fields(fields))
+    # Copy - metadata dicts are shared across requests
+    results = [{**job, "distance": distance} for job, (_, distance) in zip(jobs, neighbours)]
+
+    return {
+        "job_id": job_id,
+        "results": results,
+        "total": len(results)
+    }
+
+def request_deadline(request: Request) -> Optional[float]:
+    """Absolute deadline (monotonic seconds) for this request, or None for no deadline"""
+    budget_ms = CHAT_LATENCY_BUDGET_MS
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is not None:
+        try:
+            budget_ms = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {DEADLINE_HEADER} header: {header!r}")
+    if budget_ms <= 0:
+        return None
+    return time.monotonic() + budget_ms / 1000
+
+def remaining_seconds(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+def fast_response(relevant_jobs: list, fields: Optional[list], **extra) -> dict:
+    """Retrieved jobs without a GPT summary (return_all, or the deadline is near)"""
+    return {
+        "answer": f"Found {len(relevant_jobs)} jobs matching your criteria." if relevant_jobs else "No jobs found matching your criteria.",
+        "jobs": project_fields(relevant_jobs, fields),
+        "total_matches": len(relevant_jobs),
+        "mode": "fast",
+        **extra
     }
 
 @app.post("/chat")
 async def chat(request: Request):
+    require_index()
+    deadline = request_deadline(request)  # The clock starts now - covers every stage below
     data = await request.json()
     user_input = data["message"]
     user_memory = data.get("user_memory", "")  # Optional user preferences/profile
     return_all = data.get("return_all", False)  # Flag to return all matches without GPT
+    user_id = data.get("user_id")  # Optional saved profile used for local re-ranking
+    # Optional projection, e.g. ["title", "company", "salary"] - body or ?fields= query param
+    fields = parse_fields(data.get("fields") or request.query_params.get("fields"))
+
+    record_query(user_input)
 
-    # 🔍 Embed user query
-    user_vector = embed_text(user_input)
+    # 🔍 Embed user query (cached; in a worker thread so identical concurrent queries coalesce).
+    # The embedding call itself gets the remaining budget, so the worker thread
+    # gives up too - wait_for is only the backstop for a coalesced/slow-to-return call
+    remaining = remaining_seconds(deadline)
+    try:
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Latency budget exhausted before embedding")
+        user_vector = await asyncio.wait_for(
+            run_in_threadpool(cached_query_vector, user_input, remaining), timeout=remaining
+        )
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        # Nothing retrieved yet, so there's nothing to degrade to
+        chat_deadline_stats["embed_timeouts"] += 1
+        raise HTTPException(status_code=504, detail="Latency budget exhausted while embedding the query")
     
     # Get total number of jobs in index
     total_jobs = faiss_index.ntotal
@@ -106,85 +466,71 @@ async def chat(request: Request):
     # Create cache key from query for caching
     query_cache_key = hashlib.md5(f"{user_input}_{user_memory}".encode()).hexdigest()
     
-    # Search FAISS index (cached implicitly by query similarity)
-    D, I = faiss_index.search(np.array([user_vector]).astype("float32"), k=initial_k)
-    
-    # Get candidate jobs
-    candidate_jobs = [metadata[i] for i in I[0] if i < len(metadata)]
-    
-    # 🔍 Smart filtering based on query keywords
-    user_input_lower = user_input.lower()
+    # Search FAISS index in a worker thread - with INDEX_MODE=sharded this is a
+    # cross-process RPC that can take up to SHARD_TIMEOUT_MS (capped by the budget)
+    remaining = remaining_seconds(deadline)
+    if remaining is not None and remaining <= 0:
+        chat_deadline_stats["search_timeouts"] += 1
+        raise HTTPException(status_code=504, detail="Latency budget exhausted before the vector search")
+    search_options = {"timeout": remaining} if remaining is not None and index_info.get("index_mode") == "sharded" else {}
+    D, I = await run_in_threadpool(
+        faiss_index.search, np.array([user_vector]).astype("float32"), initial_k, **search_options
+    )
+    # Counted only now: a 504 above has no results to degrade to, so it's an
+    # embed/search timeout, not a (non-)degraded summary request
+    if not return_all:
+        chat_deadline_stats["summary_requests"] += 1
     
-    # Extract location keywords from query
-    location_keywords = []
-    uk_cities = ['manchester', 'birmingham', 'edinburgh', 'glasgow', 'bristol', 'cambridge', 
-                 'oxford', 'leeds', 'liverpool', 'sheffield', 'nottingham', 'cardiff']
-    for city in uk_cities:
-        if city in user_input_lower:
-            location_keywords.append(city)
+    # Get candidate jobs (FAISS pads with -1 when k > matches)
+    valid = (I[0] >= 0) & (I[0] < len(metadata))
+    candidate_ids = I[0][valid]
+    candidate_distances = D[0][valid]
+    candidate_jobs = [metadata[i] for i in candidate_ids]
     
-    # Extract tech stack keywords
-    tech_keywords = []
-    common_techs = ['python', 'java', 'javascript', 'typescript', 'react', 'node', 'aws', 'kubernetes', 
-                    'docker', 'sql', 'nosql', 'mongodb', 'postgres', 'redis', 'kafka', 'scala', 'kotlin',
-                    'swift', 'go', 'rust', 'c++', 'c#', '.net', 'django', 'flask', 'spring', 'angular', 'vue']
-    for tech in common_techs:
-        if tech in user_input_lower:
-            tech_keywords.append(tech)
+    # 👤 Personalize with the saved profile - its embedding was cached at save time,
+    # so this is local math only (no extra API call, no extra prompt tokens)
+    profile = await load_profile(user_id, remaining_seconds(deadline)) if user_id else None
+    if profile:
+        personal_scores = profile_scores(profile, candidate_jobs, job_vectors[candidate_ids])
+    else:
+        personal_scores = np.zeros(len(candidate_jobs), dtype="float32")
     
-    # Apply smart filtering
-    filtered_jobs = []
-    for job in candidate_jobs:
-        score = 0
-        job_location = job.get('location', '').lower()
-        job_tech_stack = [t.lower() for t in job.get('tech_stack', [])]
-        job_title = job.get('title', '').lower()
-        job_company = job.get('company', '').lower()
-        
-        # Location matching (highest priority)
-        if location_keywords:
-            if any(keyword in job_location for keyword in location_keywords):
-                score += 100  # Strong match for location
-            elif 'london' in job_location and 'london' not in location_keywords:
-                score -= 50  # Penalize non-matching locations strongly
-        
-        # Tech stack matching
-        if tech_keywords:
-            matching_techs = sum(1 for tech in tech_keywords if tech in ' '.join(job_tech_stack))
-            score += matching_techs * 10
-        
-        # Title matching
-        query_words = [w for w in user_input_lower.split() if len(w) > 3]  # Skip short words
-        for word in query_words:
-            if word in job_title:
-                score += 5
-            if word in job_company:
-                score += 3
-        
-        filtered_jobs.append((score, job))
+    # 🔍 Smart filtering based on query keywords (vectorized over all candidates)
+    keywords = candidate_scorer.extract_keywords(user_input)
+    location_keywords = keywords["locations"]
+    tech_keywords = keywords["techs"]
+    scores = candidate_scorer.score(user_input, candidate_ids, keywords=keywords)
     
-    # Sort by score (descending) and take top results
-    filtered_jobs.sort(key=lambda x: x[0], reverse=True)
+    # Sort by score (descending), profile fit breaks ties, FAISS order breaks the rest
+    order = np.lexsort((-personal_scores, -scores))
+    positive_order = order[scores[order] > 0][:MAX_GPT_CONTEXT_RESULTS]
     
     # Only return jobs with positive scores if location filtering was applied
     if location_keywords:
         # Strict location filtering - only return jobs that match the location
-        relevant_jobs = [job for score, job in filtered_jobs if score > 0][:MAX_GPT_CONTEXT_RESULTS]
+        relevant_jobs = [candidate_jobs[i] for i in positive_order]
     elif tech_keywords:
         # Tech filtering - return jobs with positive scores
-        relevant_jobs = [job for score, job in filtered_jobs if score > 0][:MAX_GPT_CONTEXT_RESULTS]
+        relevant_jobs = [candidate_jobs[i] for i in positive_order]
+    elif profile:
+        # No filters but a saved profile - blend FAISS similarity with profile fit
+        # (IndexFlatL2 returns squared L2; for unit vectors cos = 1 - d/2)
+        blended = (1 - candidate_distances / 2) + personal_scores
+        order = np.argsort(-blended, kind="stable")[:MAX_GPT_CONTEXT_RESULTS]
+        relevant_jobs = [candidate_jobs[i] for i in order]
     else:
         # No specific filters - use FAISS similarity results
         relevant_jobs = candidate_jobs[:MAX_GPT_CONTEXT_RESULTS]
     
     # 🚀 Fast mode: return results without GPT processing
     if return_all:
-        return {
-            "answer": f"Found {len(relevant_jobs)} jobs matching your criteria." if relevant_jobs else "No jobs found matching your criteria.",
-            "jobs": relevant_jobs,
-            "total_matches": len(relevant_jobs),
-            "mode": "fast"
-        }
+        return fast_response(relevant_jobs, fields)
+
+    # ⏳ Not enough budget left for a summary - degrade to fast mode right away
+    remaining = remaining_seconds(deadline)
+    if remaining is not None and remaining * 1000 < CHAT_MIN_SUMMARY_MS:
+        chat_deadline_stats["skipped_before_gpt"] += 1
+        return fast_response(relevant_jobs, fields, summary_skipped=True)
 
     # 🧠 Build rich context from retrieved metadata
     relevant_chunks = "\n\n".join([
@@ -239,12 +585,24 @@ Please provide a comprehensive response:
         }
     ]
 
-    # 🧠 Call GPT-4o
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0.3,  # Lower temperature for more consistent, complete responses
-    )
+    # 🧠 Call GPT-4o - the client gets the remaining budget (throttling + retries
+    # included), wait_for also covers waiting on a coalesced identical call
+    remaining = remaining_seconds(deadline)
+    try:
+        response = await asyncio.wait_for(
+            run_in_threadpool(
+                get_openai_client().create_chat_completion,
+                timeout=remaining,
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.3,  # Lower temperature for more consistent, complete responses
+            ),
+            timeout=remaining
+        )
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        chat_deadline_stats["gpt_timeouts"] += 1
+        return fast_response(relevant_jobs, fields, summary_skipped=True)
+    chat_deadline_stats["summaries"] += 1
     
     gpt_answer = response.choices[0].message.content
     
@@ -254,9 +612,58 @@ Please provide a comprehensive response:
 
     return {
         "answer": gpt_answer,
-        "jobs": relevant_jobs,  # Also return raw job data
+        "jobs": project_fields(relevant_jobs, fields),  # Also return raw job data
         "total_matches": len(relevant_jobs),
-        "mode": "gpt"
+        "mode": "gpt",
+        "summary_skipped": False
+    }
+
+@app.post("/agent-chat")
+async def agent_chat(request: Request):
+    """
+    Agentic RAG: the JobAgent parses the query into filters (salary, location,
+    visa, remote) and widens its vector search until `top_k` jobs pass them
+    or the search budget runs out. No GPT call - the filters ARE the answer.
+    """
+    require_index()
+    data = await request.json()
+    user_input = data["message"]
+    top_k = max(1, min(int(data.get("top_k", MAX_GPT_CONTEXT_RESULTS)), MAX_AGENT_RESULTS))
+    fields = parse_fields(data.get("fields") or request.query_params.get("fields"))
+
+    # Embedding + FAISS searches are blocking - keep them off the event loop
+    result = await run_in_threadpool(job_agent.search, user_input, top_k)
+    jobs = result["jobs"]
+
+    response = {
+        "answer": f"Found {len(jobs)} jobs matching your criteria." if jobs else "No jobs found matching your criteria.",
+        "jobs": project_fields(jobs, fields),
+        "total_matches": len(jobs),
+        "parsed_query": result["parsed_query"],
+        "search": result["search_stats"],  # iterations, candidates_examined, search_ms, stopped
+        "mode": "agent"
+    }
+    # 📊 Comparison queries are answered from the precomputed salary cube
+    if "comparison" in result:
+        response["answer"] = "Salary comparison:\n" + format_comparison(result["comparison"])
+        response["comparison"] = result["comparison"]
+    return response
+
+@app.get("/compare")
+async def compare(
+    skills: Optional[str] = Query(None, description="Comma-separated skills, e.g. python,java"),
+    locations: Optional[str] = Query(None, description="Comma-separated cities, e.g. london,manchester")
+):
+    """
+    Salary percentiles, job counts and visa sponsorship rates per skill x location,
+    from the cube precomputed at build time (no search, no GPT).
+    Omit skills or locations to aggregate over all of them.
+    """
+    require_index()
+    rows = salary_cube.compare(parse_fields(skills) or [None], parse_fields(locations) or [None])
+    return {
+        "results": rows,
+        "total_jobs": salary_cube.num_jobs
     }
 
 @app.post("/user/profile")
@@ -265,41 +672,83 @@ async def save_user_profile(request: Request):
     Save or update user preferences and profile information.
     This will be used to personalize job recommendations.
     """
+    require_index()  # The profile must be embedded with the index's embedder
     data = await request.json()
     user_id = data.get("user_id", "default")
     preferences = data.get("preferences", {})
     
-    # Store preferences
-    user_profiles[user_id] = {
-        "preferences": preferences,
-        "tech_stack_preferences": preferences.get("tech_stack", []),
-        "salary_min": preferences.get("salary_min"),
-        "company_size_preference": preferences.get("company_size"),
-        "visa_required": preferences.get("visa_required", False),
-        "notes": preferences.get("notes", "")
-    }
+    # Store preferences + embed the profile once, here, instead of on every /chat
+    try:
+        profile = build_profile(preferences)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid preferences: {e}")
+    profile_text = profile_embedding_text(profile)
+    embedding = await run_in_threadpool(embed_text, profile_text) if profile_text else None
+    await run_in_threadpool(profile_store.save, user_id, profile, embedding, query_embedder.config())
     
     return {
         "status": "success",
         "user_id": user_id,
-        "profile": user_profiles[user_id]
+        "profile": profile
     }
 
 @app.get("/user/profile/{user_id}")
 async def get_user_profile(user_id: str):
     """Get user profile and preferences"""
-    profile = user_profiles.get(user_id, {})
+    profile = await run_in_threadpool(profile_store.get, user_id) or {}
+    profile.pop("embedding", None)  # Internal - not part of the API
+    profile.pop("embedder", None)
     return {
         "user_id": user_id,
         "profile": profile
     }
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving HTTP (even while the index loads)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: 200 once the index is loaded (and warmed up), 503 before that"""
+    status = "ready" if index_ready else ("failed" if startup_error else "loading")
+    return ORJSONResponse(
+        status_code=200 if index_ready else 503,
+        content={
+            "status": status,
+            "error": startup_error,
+            "startup_ms": startup_timings,
+            "total_jobs": len(metadata)
+        }
+    )
+
+def chat_deadline_summary() -> dict:
+    wanted = chat_deadline_stats["summary_requests"]
+    degraded = chat_deadline_stats["skipped_before_gpt"] + chat_deadline_stats["gpt_timeouts"]
+    return {
+        "budget_ms": CHAT_LATENCY_BUDGET_MS,
+        **chat_deadline_stats,
+        "degraded": degraded,
+        "degradation_rate": degraded / wanted if wanted else 0.0
+    }
+
 @app.get("/stats")
-async def get_stats():
+async def get_stats(
+    lag_window: float = Query(10.0, gt=0, le=600, description="Seconds of event-loop lag history to summarize")
+):
     """Get system statistics"""
+    openai_client = peek_openai_client()  # Never build the client on the event loop just for stats
     return {
+        "ready": index_ready,
+        "startup_ms": startup_timings,
         "total_jobs": len(metadata),
-        "total_users": len(user_profiles),
-        "cache_size": cached_search.cache_info()._asdict() if hasattr(cached_search, 'cache_info') else {},
-        "max_gpt_results": MAX_GPT_CONTEXT_RESULTS
+        "total_users": await run_in_threadpool(profile_store.count),
+        "cache_size": cached_query_vector.cache_info(),
+        "max_gpt_results": MAX_GPT_CONTEXT_RESULTS,
+        "index": {"mode": index_info.get("index_mode", "flat"), **getattr(faiss_index, "stats", {})},
+        "embedder": query_embedder.config() if query_embedder else None,
+        "openai_client": dict(openai_client.stats) if openai_client else None,
+        "chat_deadline": chat_deadline_summary(),
+        "aggregates": {"cells": len(salary_cube.cells), "jobs": salary_cube.num_jobs} if salary_cube else None,
+        "event_loop_lag_ms": event_loop_lag_summary(lag_window)
     }
\ No newline at end of file
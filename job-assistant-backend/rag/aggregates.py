@@ -0,0 +1,174 @@
+# chatgpt_clone/rag/aggregates.py
+"""
+Salary Cube - Precomputed salary / count / visa aggregates per skill x location
+
+Every job contributes to 4 cells per skill it lists:
+    (skill, city), (skill, "*"), ("*", city), ("*", "*")
+Each cell keeps its annual salaries (midpoint of the normalized range, sorted),
+a job count and a visa-sponsorship count, so "Python vs Java salaries in London"
+is a couple of dict lookups + percentiles - no vector search, no GPT.
+
+When jobs are appended the cube is EXTENDED: only the new jobs are grouped and
+merged into the existing cells.
+"""
+
+import os
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from .salary import parse_salary
+from .visa import offers_visa_sponsorship
+
+ANY = "*"  # Wildcard dimension value ("all skills" / "all locations")
+PERCENTILES = (10, 25, 50, 75, 90)
+# Bumped when a cell's definition changes - older files are rebuilt, not extended
+# (2: visa counts use rag/visa.py, which reads "not available" as no sponsorship)
+CUBE_VERSION = 2
+
+
+def aggregates_path(index_path: str) -> str:
+    return index_path.replace(".index", ".aggregates.npz")
+
+
+def skill_key(skill: str) -> str:
+    return str(skill).strip().lower()
+
+
+def location_key(location: str) -> str:
+    """"London, UK" → "london", anything mentioning remote → "remote" """
+    location_lower = str(location or "").lower()
+    if "remote" in location_lower:
+        return "remote"
+    return location_lower.split(",")[0].strip()
+
+
+def _job_cells(job: Dict) -> List[Tuple[str, str]]:
+    skills = {skill_key(s) for s in job.get("tech_stack", []) if str(s).strip()}
+    location = location_key(job.get("location", ""))
+    cells = [(ANY, ANY)]
+    if location:
+        cells.append((ANY, location))
+    for skill in skills:
+        cells.append((skill, ANY))
+        if location:
+            cells.append((skill, location))
+    return cells
+
+
+class SalaryCube:
+    """Skill x location aggregates: cell → (job count, visa count, sorted salaries)"""
+
+    def __init__(self, cells: Optional[Dict[Tuple[str, str], Dict]] = None, num_jobs: int = 0):
+        self.cells = cells or {}
+        self.num_jobs = num_jobs  # Jobs (metadata rows) covered - extend() starts here
+
+    @classmethod
+    def build(cls, metadata: List[Dict]) -> "SalaryCube":
+        return cls().extend(metadata)
+
+    def extend(self, metadata: List[Dict]) -> "SalaryCube":
+        """Merge metadata[num_jobs:] (jobs appended since the cube was built)"""
+        if len(metadata) <= self.num_jobs:
+            return self
+
+        counts, visas, salaries = defaultdict(int), defaultdict(int), defaultdict(list)
+        for job in metadata[self.num_jobs:]:
+            low, high = parse_salary(job.get("salary", ""))
+            visa = offers_visa_sponsorship(job.get("visa_sponsorship"))
+            for cell in _job_cells(job):
+                counts[cell] += 1
+                visas[cell] += visa
+                if low is not None:
+                    salaries[cell].append((low + high) / 2)
+
+        cells = dict(self.cells)
+        for cell, count in counts.items():
+            old = cells.get(cell, {"count": 0, "visa": 0, "salaries": np.zeros(0, dtype="float32")})
+            cells[cell] = {
+                "count": old["count"] + count,
+                "visa": old["visa"] + visas[cell],
+                "salaries": np.sort(np.concatenate([
+                    old["salaries"], np.asarray(salaries[cell], dtype="float32")
+                ])),
+            }
+        return SalaryCube(cells, len(metadata))
+
+    def stats(self, skill: Optional[str] = None, location: Optional[str] = None) -> Dict:
+        """Aggregates for one cell (None = all skills / all locations)"""
+        key = (skill_key(skill) if skill else ANY, location_key(location) if location else ANY)
+        cell = self.cells.get(key, {"count": 0, "visa": 0, "salaries": np.zeros(0, dtype="float32")})
+        salaries = cell["salaries"]
+
+        salary = None
+        if len(salaries):
+            values = np.percentile(salaries, PERCENTILES)
+            salary = {("median" if p == 50 else f"p{p}"): int(v) for p, v in zip(PERCENTILES, values)}
+            salary["mean"] = int(salaries.mean())
+
+        return {
+            "skill": skill or "all",
+            "location": location or "all",
+            "jobs": cell["count"],
+            "jobs_with_salary": int(len(salaries)),
+            "salary": salary,
+            "visa_sponsorship_rate": cell["visa"] / cell["count"] if cell["count"] else None,
+        }
+
+    def compare(self, skills: Iterable[Optional[str]] = (None,),
+                locations: Iterable[Optional[str]] = (None,)) -> List[Dict]:
+        """One row per skill x location combination"""
+        locations = list(locations) or [None]
+        return [self.stats(skill, location) for skill in (list(skills) or [None]) for location in locations]
+
+    def save(self, path: str):
+        keys = sorted(self.cells)
+        sizes = [len(self.cells[k]["salaries"]) for k in keys]
+        np.savez(
+            path,
+            skills=np.array([k[0] for k in keys], dtype=str),
+            locations=np.array([k[1] for k in keys], dtype=str),
+            counts=np.array([self.cells[k]["count"] for k in keys], dtype="int32"),
+            visas=np.array([self.cells[k]["visa"] for k in keys], dtype="int32"),
+            offsets=np.concatenate([[0], np.cumsum(sizes)]).astype("int64"),
+            salaries=(np.concatenate([self.cells[k]["salaries"] for k in keys])
+                      if keys else np.zeros(0, dtype="float32")).astype("float32"),
+            num_jobs=np.int64(self.num_jobs),
+            version=np.int64(CUBE_VERSION),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SalaryCube"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            version = int(data["version"]) if "version" in data else 1
+            if version != CUBE_VERSION:
+                return None  # Built with an older cell definition
+            offsets, salaries = data["offsets"], data["salaries"]
+            cells = {
+                (str(skill), str(location)): {
+                    "count": int(count),
+                    "visa": int(visa),
+                    "salaries": salaries[offsets[i]:offsets[i + 1]],
+                }
+                for i, (skill, location, count, visa) in enumerate(
+                    zip(data["skills"], data["locations"], data["counts"], data["visas"])
+                )
+            }
+            return cls(cells, int(data["num_jobs"]))
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    """One readable line per row, e.g. for the agent's answer"""
+    lines = []
+    for row in rows:
+        label = f"{row['skill']} in {row['location']}" if row["location"] != "all" else row["skill"]
+        if not row["jobs"]:
+            lines.append(f"- {label}: no jobs")
+            continue
+        salary = row["salary"]
+        pay = (f"median £{salary['median']:,} (p25 £{salary['p25']:,} - p75 £{salary['p75']:,})"
+               if salary else "no salary data")
+        visa = f"{row['visa_sponsorship_rate'] * 100:.0f}% sponsor visas"
+        lines.append(f"- {label}: {pay}, {row['jobs']} jobs, {visa}")
+    return "\n".join(lines)
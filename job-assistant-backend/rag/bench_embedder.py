@@ -0,0 +1,91 @@
+# chatgpt_clone/rag/bench_embedder.py
+"""
+Embedder Benchmark - Query latency and batch throughput per backend
+
+Run from job-assistant-backend/:
+    python -m rag.bench_embedder --backends openai,hashing
+    python -m rag.bench_embedder --backends onnx --model-path models/all-MiniLM-L6-v2
+"""
+
+import argparse
+import time
+import numpy as np
+from .embedder import get_embedder
+from .retriever import load_faiss_index
+
+
+SAMPLE_QUERIES = [
+    "Python backend jobs in London",
+    "Senior React developer with TypeScript",
+    "Machine learning engineer paying over £80k",
+    "Java Spring Boot roles with visa sponsorship",
+    "Remote DevOps engineer Kubernetes AWS",
+]
+
+
+def _corpus_texts(limit: int):
+    """Use real job texts when an index exists, otherwise repeat the sample queries"""
+    try:
+        _, metadata = load_faiss_index()
+        texts = [
+            f"{j.get('title')} | {j.get('company')} | {j.get('salary')} | "
+            f"{', '.join(j.get('tech_stack', [])[:5])} | {j.get('description', '')}"
+            for j in metadata
+        ]
+    except Exception:
+        texts = []
+    texts = texts or SAMPLE_QUERIES
+    return (texts * (limit // len(texts) + 1))[:limit]
+
+
+def benchmark(embedder, queries, corpus, repeats: int, batch_size: int):
+    # Warm-up (model load / connection setup shouldn't count)
+    embedder.embed(queries[0])
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embedder.embed(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    vectors = embedder.embed_batch(corpus, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "dimension": int(vectors.shape[1]) if len(vectors) else 0,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "batch_texts_per_sec": len(corpus) / batch_seconds if batch_seconds else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", default="openai,hashing", help="Comma-separated backends")
+    parser.add_argument("--model-path", help="Folder with model.onnx + tokenizer.json (onnx backend)")
+    parser.add_argument("--corpus-size", type=int, default=256, help="Texts for the batch benchmark")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the sample queries")
+    args = parser.parse_args()
+
+    corpus = _corpus_texts(args.corpus_size)
+    print(f"📊 Benchmarking {len(SAMPLE_QUERIES) * args.repeats} queries + {len(corpus)} batched texts\n")
+    print(f"{'backend':<10} {'dim':>6} {'p50 ms':>9} {'p95 ms':>9} {'batch texts/s':>15}")
+
+    for backend in args.backends.split(","):
+        config = {"backend": backend.strip()}
+        if config["backend"] == "onnx":
+            config["model_path"] = args.model_path
+        try:
+            result = benchmark(get_embedder(config), SAMPLE_QUERIES, corpus, args.repeats, args.batch_size)
+        except Exception as e:
+            print(f"{backend:<10} ✗ skipped: {e}")
+            continue
+        print(f"{backend:<10} {result['dimension']:>6} {result['query_p50_ms']:>9.2f} "
+              f"{result['query_p95_ms']:>9.2f} {result['batch_texts_per_sec']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,38 @@
 # chatgpt_clone/rag/build_index.py
+# Run from job-assistant-backend/:  python -m rag.build_index
 
 import os, json
-from embedder import embed_text
-from retriever import save_faiss_index, create_faiss_index
+import numpy as np
+from .aggregates import SalaryCube, aggregates_path
+from .embedder import get_embedder, embedder_config_from_env
+from .retriever import (save_faiss_index, create_faiss_index, default_index_path,
+                        load_index_info, load_metadata, load_job_vectors)
+from .sharding import job_key, partition_jobs, write_shards
+from .similar_jobs import SimilarJobsTable, knn_table_path
+from .two_stage import build_first_stage, compare_with_flat, load_two_stage_index, reducer_path
 
 # Get the path to jobs_raw (two directories up from this script)
-jobs_dir = os.path.join(os.path.dirname(__file__), "..", "..", "jobs_raw")
+jobs_dir = os.getenv("JOBS_RAW_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "jobs_raw"))
+index_path = default_index_path()
 texts, metadata = [], []
+embedder = get_embedder(embedder_config_from_env())
+
+# ♻️ INCREMENTAL_BUILD=1: keep already-indexed jobs (same ids, same vectors)
+# and only embed files whose content isn't indexed yet. Append-only -
+# run a full build to drop removed jobs.
+previous_metadata, previous_vectors = [], None
+if os.getenv("INCREMENTAL_BUILD") == "1":
+    if load_index_info(index_path).get("embedder") == embedder.config() and load_job_vectors(index_path) is not None:
+        previous_metadata = load_metadata(index_path)
+        # A real copy, not a view of the memory-mapped file we're about to overwrite
+        previous_vectors = np.array(load_job_vectors(index_path), dtype="float32")
+        print(f"♻️  Incremental build: keeping {len(previous_metadata)} indexed jobs")
+    else:
+        print("⚠️  No compatible previous index (embedder changed or vectors missing) - full build")
+# Content hash, same identity as shard partitioning - links aren't unique in scraped data.
+# Only ever compared against the previous index: a full build keeps every file
+indexed_keys = {job_key(job) for job in previous_metadata}
+skipped = 0
 
 print(f"📂 Loading jobs from: {jobs_dir}")
 
@@ -28,20 +54,15 @@ for fname in json_files:
             visa_sponsorship = job.get('visa_sponsorship', 'unknown')
             link = job.get('link', '')
             
-            # Extract location from link or set default
-            location = "London, UK"  # Default based on your Glassdoor link
+            # Use the scraped location if present, otherwise default
+            location = job.get('location') or "London, UK"  # Default based on your Glassdoor link
             
             # Create short description (first 200 chars)
             short_description = description[:200] if description else "No description available"
             
-            # 🧠 Create optimized embedding text (summarized, not full description)
-            # This is what will be embedded - focused and concise
-            embedding_text = f"{title} | {company} | {salary} | {', '.join(tech_stack[:5])} | {short_description}"
-            
-            texts.append(embedding_text)
-            
             # 📦 Store RICH metadata (this won't be embedded, just stored for retrieval)
-            metadata.append({
+            job_metadata = {
+                "id": len(previous_metadata) + len(metadata),  # Row in the index
                 "title": title,
                 "company": company,
                 "salary": salary,
@@ -51,26 +72,122 @@ for fname in json_files:
                 "visa_sponsorship": visa_sponsorship,
                 "link": link,
                 "full_description": description  # Store full description for detail view
-            })
+            }
+            if indexed_keys and job_key(job_metadata) in indexed_keys:
+                skipped += 1  # Incremental build: already in the index
+                continue
+            
+            # 🧠 Create optimized embedding text (summarized, not full description)
+            # This is what will be embedded - focused and concise
+            embedding_text = f"{title} | {company} | {salary} | {', '.join(tech_stack[:5])} | {short_description}"
+            
+            texts.append(embedding_text)
+            metadata.append(job_metadata)
             
             print(f"  ✓ Loaded: {fname} - {title} at {company}")
     except Exception as e:
         print(f"  ✗ Error loading {fname}: {e}")
         continue
 
-print(f"\n🔢 Total jobs loaded: {len(texts)}")
+print(f"\n🔢 Total jobs loaded: {len(texts)}" + (f" ({skipped} already indexed)" if skipped else ""))
 
-# Embed all text
-print("🧠 Embedding texts...")
+# Embed all text (EMBEDDER_BACKEND=openai|onnx|hashing picks the backend)
+print(f"🧠 Embedding texts with the '{embedder.backend}' backend (batched)...")
 print("   (Using optimized summary format: title | company | salary | tech_stack | short_description)")
-vectors = [embed_text(t) for t in texts]
+vectors = embedder.embed_batch(texts)
+
+if previous_vectors is not None:
+    vectors = np.vstack([previous_vectors, vectors]) if len(texts) else previous_vectors
+    metadata = previous_metadata + metadata
 
 # Create FAISS index
-print("🔍 Creating FAISS index...")
-index = create_faiss_index(vectors)
+# INDEX_MODE=two_stage builds a low-dim first stage (FIRST_STAGE_DIM, REDUCTION=truncate|pca)
+# that is re-ranked with the full vectors (RERANK_OVERSAMPLE x k shortlist)
+# INDEX_MODE=sharded splits the corpus into NUM_SHARDS flat shards (SHARD_BY=hash|location)
+index_mode = os.getenv("INDEX_MODE", "flat")
+info = {
+    "embedder": embedder.config(),
+    "dimension": int(vectors.shape[1]),
+    "num_jobs": len(metadata),
+    "index_mode": index_mode,
+}
+
+if index_mode == "two_stage":
+    print("🔍 Creating two-stage FAISS index...")
+    index, reducer = build_first_stage(
+        vectors, os.getenv("REDUCTION", "truncate"), int(os.getenv("FIRST_STAGE_DIM", "256"))
+    )
+    info["first_stage"] = {
+        "method": reducer.method,
+        "dim": reducer.dim,
+        "oversample": int(os.getenv("RERANK_OVERSAMPLE", "4")),
+    }
+    print(f"   ({reducer.method}: {vectors.shape[1]} → {reducer.dim} dims)")
+elif index_mode == "sharded":
+    num_shards = int(os.getenv("NUM_SHARDS", "4"))
+    shard_by = os.getenv("SHARD_BY", "hash")
+    print(f"🔍 Creating {num_shards} FAISS shards (by {shard_by})...")
+    partition = partition_jobs(metadata, num_shards, shard_by)
+    shard_sizes = write_shards(vectors, partition["assignments"], index_path, num_shards)
+    # locations → shards lets a location-filtered search skip shards with no jobs there
+    info["shards"] = {"count": len(shard_sizes), "by": shard_by, "sizes": shard_sizes,
+                      "locations": partition["locations"]}
+    print(f"   (jobs per shard: {shard_sizes})")
+    index = None
+else:
+    print("🔍 Creating FAISS index...")
+    index = create_faiss_index(vectors)
 
 # Save index and metadata
 print("💾 Saving index and metadata...")
-save_faiss_index(index, metadata=metadata)
-print(f"✅ FAISS index and metadata saved with {len(texts)} jobs!")
-print(f"📊 Metadata includes: title, company, salary, tech_stack, location, description, visa_sponsorship, link")
+# The embedder config is stored with the index so queries use the same backend
+save_faiss_index(index, path=index_path, metadata=metadata, info=info, vectors=vectors)
+
+if index_mode == "two_stage":
+    reducer.save(reducer_path(index_path))
+
+    # 📈 How much faster is it, and what does it cost in recall?
+    # Real recorded user queries (WARMUP_QUERIES_PATH) if available, else leave-one-out
+    query_vectors = None
+    queries_path = os.getenv("WARMUP_QUERIES_PATH")
+    if queries_path and os.path.exists(queries_path):
+        with open(queries_path) as f:
+            recorded = list(dict.fromkeys(line.strip() for line in f if line.strip()))[:200]
+        if recorded:
+            query_vectors = embedder.embed_batch(recorded)
+    report = compare_with_flat(load_two_stage_index(index, index_path, info["first_stage"]), vectors,
+                               query_vectors=query_vectors)
+    print(f"📈 Two-stage vs flat ({report['queries']} queries, {report['method']}, recall@{report['k']}):")
+    print(f"   flat:      {report['flat_ms_per_query']:.3f} ms/query")
+    print(f"   two-stage: {report['two_stage_ms_per_query']:.3f} ms/query")
+    print(f"   recall:    {report['recall_at_k']:.3f}")
+
+# 🤝 Similar jobs: k-NN table over the whole corpus (SIMILAR_JOBS_K=0 disables)
+knn_k = int(os.getenv("SIMILAR_JOBS_K", "10"))
+if knn_k > 0:
+    previous_table = SimilarJobsTable.load(knn_table_path(index_path)) if previous_vectors is not None else None
+    if previous_table is not None and previous_table.num_jobs == len(previous_vectors) and previous_table.k == knn_k:
+        print(f"🤝 Extending similar-jobs table with {len(vectors) - previous_table.num_jobs} new jobs...")
+        table = previous_table.extend(vectors)
+    else:
+        print(f"🤝 Computing similar-jobs table (k={knn_k})...")
+        table = SimilarJobsTable.build(vectors, knn_k)
+    table.save(knn_table_path(index_path))
+elif os.path.exists(knn_table_path(index_path)):
+    # A table from an earlier build would serve neighbours of different jobs
+    os.remove(knn_table_path(index_path))
+    print("🤝 Similar-jobs table disabled - removed the stale one")
+
+# 📊 Salary / count / visa aggregates per skill x location (comparison queries)
+previous_cube = SalaryCube.load(aggregates_path(index_path)) if previous_vectors is not None else None
+if previous_cube is not None and previous_cube.num_jobs == len(previous_metadata):
+    print(f"📊 Extending salary cube with {len(metadata) - previous_cube.num_jobs} new jobs...")
+    cube = previous_cube.extend(metadata)
+else:
+    print("📊 Computing salary cube (skill x location)...")
+    cube = SalaryCube.build(metadata)
+cube.save(aggregates_path(index_path))
+print(f"   ({len(cube.cells)} cells)")
+
+print(f"✅ FAISS index and metadata saved with {len(metadata)} jobs!")
+print(f"📊 Metadata includes: id, title, company, salary, tech_stack, location, description, visa_sponsorship, link")
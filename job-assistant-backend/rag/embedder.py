@@ -1,18 +1,269 @@
 # chatgpt_clone/rag/embedder.py
+"""
+Embedders - Pluggable text → vector backends
+
+- openai:  text-embedding-3-small over the network (default)
+- onnx:    local CPU sentence-embedding model (model.onnx + tokenizer.json in a folder)
+- hashing: feature-hashing projection, no model and no network (tests / offline dev)
+
+The backend used to build an index is recorded in the index info file,
+and the server loads the SAME backend, so query and corpus vectors always match.
+"""
+
 import os
+import re
 import json
-import openai
-from dotenv import load_dotenv
-
-load_dotenv()
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def embed_text(text: str) -> list:
-    response = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    return response.data[0].embedding
+import hashlib
+import threading
+import numpy as np
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from .openai_client import get_openai_client
+
+
+class Embedder(ABC):
+    """Base interface: embed one text or a batch of texts"""
+
+    backend = "base"
+    _output_dim: Optional[int] = None
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Returns a float32 matrix of shape (len(texts), dimension) - (0, dimension) for no texts"""
+
+    def output_dim(self) -> int:
+        """Vector width - probed once with a dummy text unless the backend knows it"""
+        if self._output_dim is None:
+            self._output_dim = int(self.embed_batch(["dimension probe"]).shape[1])
+        return self._output_dim
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> list:
+        """`timeout` (seconds) bounds remote backends; local ones ignore it"""
+        return self.embed_batch([text])[0].tolist()
+
+    def config(self) -> Dict:
+        """Everything needed to recreate this embedder (stored with the index)"""
+        return {"backend": self.backend}
+
+
+class OpenAIEmbedder(Embedder):
+    backend = "openai"
+
+    def __init__(self, model: str = "text-embedding-3-small"):
+        self.model = model
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> list:
+        response = get_openai_client().create_embedding(
+            model=self.model,
+            input=text,
+            timeout=timeout  # Whole call incl. throttling + retries (DeadlineExceeded)
+        )
+        return response.data[0].embedding
+
+    def embed_batch(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.output_dim()), dtype="float32")
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            response = get_openai_client().create_embedding(
+                model=self.model,
+                input=texts[start:start + batch_size]
+            )
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+        vectors = np.asarray(vectors, dtype="float32")
+        self._output_dim = vectors.shape[1]  # Remembered, so an empty batch needs no probe request
+        return vectors
+
+    def config(self) -> Dict:
+        return {"backend": self.backend, "model": self.model}
+
+
+class HashingEmbedder(Embedder):
+    """
+    Signed feature hashing of word unigrams + character trigrams,
+    L2-normalized. Deterministic, dependency-free and fast - meant for
+    tests and offline development rather than retrieval quality.
+    """
+
+    backend = "hashing"
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = int(dimension)
+        self._output_dim = self.dimension
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9+#.]+", text.lower())
+        features = list(words)
+        for word in words:
+            padded = f"^{word}$"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                vectors[row, h % self.dimension] += 1.0 if (h >> 63) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def config(self) -> Dict:
+        return {"backend": self.backend, "dimension": self.dimension}
+
+
+class OnnxEmbedder(Embedder):
+    """
+    Local CPU sentence embeddings from an exported transformer
+    (e.g. all-MiniLM-L6-v2). `model_path` is a folder with:
+    - model.onnx      (inputs: input_ids, attention_mask[, token_type_ids])
+    - tokenizer.json  (HuggingFace `tokenizers` format)
+
+    Needs the optional `onnxruntime` and `tokenizers` packages.
+    """
+
+    backend = "onnx"
+
+    def __init__(self, model_path: str, max_length: int = 256, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_path = model_path
+        self.max_length = int(max_length)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(
+            os.path.join(model_path, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # (batch, tokens, hidden) - hidden is usually static; dynamic → probed on first use
+        hidden_dim = self.session.get_outputs()[0].shape[-1]
+        if isinstance(hidden_dim, int):
+            self._output_dim = hidden_dim
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.enable_padding()
+
+    def embed_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype="int64")
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+            # Mean pooling over real (non-padding) tokens
+            hidden = self.session.run(None, inputs)[0]
+            mask = attention_mask[..., None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+
+        if not batches:
+            return np.zeros((0, self.output_dim()), dtype="float32")
+        return np.vstack(batches).astype("float32")
+
+    def config(self) -> Dict:
+        return {"backend": self.backend, "model_path": self.model_path, "max_length": self.max_length}
+
+
+EMBEDDER_BACKENDS = {
+    "openai": OpenAIEmbedder,
+    "hashing": HashingEmbedder,
+    "onnx": OnnxEmbedder,
+}
+
+# Indexes built before the embedder was recorded used OpenAI
+DEFAULT_EMBEDDER_CONFIG = {"backend": "openai", "model": "text-embedding-3-small"}
+
+
+def get_embedder(config: Optional[Dict] = None) -> Embedder:
+    """Create an embedder from a config dict like {"backend": "onnx", "model_path": "..."}"""
+    config = dict(config or DEFAULT_EMBEDDER_CONFIG)
+    backend = config.pop("backend", "openai")
+    if backend not in EMBEDDER_BACKENDS:
+        raise ValueError(f"Unknown embedder backend '{backend}' (choose from {sorted(EMBEDDER_BACKENDS)})")
+    return EMBEDDER_BACKENDS[backend](**config)
+
+
+def embedder_config_from_env() -> Dict:
+    """
+    Build-time selection:
+    EMBEDDER_BACKEND=openai|onnx|hashing, EMBEDDER_MODEL (openai),
+    EMBEDDER_MODEL_PATH (onnx), EMBEDDER_DIM (hashing)
+    """
+    backend = os.getenv("EMBEDDER_BACKEND", "openai")
+    if backend == "onnx":
+        return {"backend": "onnx", "model_path": os.environ["EMBEDDER_MODEL_PATH"]}
+    if backend == "hashing":
+        return {"backend": "hashing", "dimension": int(os.getenv("EMBEDDER_DIM", "384"))}
+    return {"backend": backend, "model": os.getenv("EMBEDDER_MODEL", "text-embedding-3-small")}
+
+
+_default_embedder: Optional[Embedder] = None
+
+
+def set_default_embedder(embedder: Embedder):
+    """Make `embed_text` use this backend (the server sets it from the index info)"""
+    global _default_embedder
+    _default_embedder = embedder
+
+
+def get_default_embedder() -> Embedder:
+    global _default_embedder
+    if _default_embedder is None:
+        _default_embedder = get_embedder()
+    return _default_embedder
+
+
+def embed_text(text: str, timeout: Optional[float] = None) -> list:
+    return get_default_embedder().embed(text, timeout=timeout)
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU of query → embedding (tuple, so callers can't mutate it).
+    Unlike functools.lru_cache, a miss can carry a `timeout` for the embedding
+    call without the timeout becoming part of the cache key; failed or
+    timed-out embeds are not cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, embed_fn=None):
+        self.maxsize = maxsize
+        self.embed_fn = embed_fn or embed_text
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, query: str, timeout: Optional[float] = None) -> tuple:
+        with self._lock:
+            if query in self._entries:
+                self._entries.move_to_end(query)
+                self.hits += 1
+                return self._entries[query]
+            self.misses += 1
+
+        vector = tuple(self.embed_fn(query, timeout=timeout))
+        with self._lock:
+            self._entries[query] = vector
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return vector
+
+    def cache_info(self) -> Dict:
+        """Same fields as functools.lru_cache's cache_info()"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "maxsize": self.maxsize,
+                    "currsize": len(self._entries)}
+
 
 def load_and_embed_jobs(jobs_folder="jobs_raw"):
     texts, metadata = [], []
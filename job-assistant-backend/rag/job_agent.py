@@ -4,10 +4,17 @@ Job Agent - The intelligent system that decides HOW to search for jobs
 This is AGENTIC RAG in action!
 """
 
+import time
 import numpy as np
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
+from .aggregates import SalaryCube
 from .embedder import embed_text
 from .query_analyzer import QueryAnalyzer
+from .salary import parse_salary
+from .visa import offers_visa_sponsorship
+
+INITIAL_CANDIDATES = 20  # First vector search size (never below top_k)
+CANDIDATE_GROWTH = 2     # Widen k geometrically while too few jobs survive the filters
 
 
 class JobAgent:
@@ -19,21 +26,40 @@ class JobAgent:
     Tool 3: Location Filter - Filters by location
     Tool 4: Visa Filter - Filters by visa sponsorship
     Tool 5: Skill Filter - Filters by exact skill matches
+    Tool 6: Salary Cube - Precomputed salary stats for comparison queries
     
     The agent DECIDES which tools to use and in what order!
     """
     
-    def __init__(self, faiss_index, metadata):
+    def __init__(
+        self,
+        faiss_index,
+        metadata,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        initial_k: int = INITIAL_CANDIDATES,
+        growth: float = CANDIDATE_GROWTH,
+        latency_budget_ms: Optional[float] = None,
+        aggregates: Optional[SalaryCube] = None
+    ):
         """
         Initialize the agent with:
         - faiss_index: Your FAISS vector index
         - metadata: List of all job dictionaries
+        - embed_fn: Query embedder (default: embed_text; main.py passes its cached one)
+        - initial_k / growth: Adaptive candidate expansion (k = initial_k, then k *= growth)
+        - latency_budget_ms: Stop widening once the next search would exceed this
+        - aggregates: Precomputed salary cube - answers comparison queries directly
         """
         self.faiss_index = faiss_index
         self.metadata = metadata
+        self.embed_fn = embed_fn or embed_text
+        self.initial_k = initial_k
+        self.growth = growth
+        self.latency_budget_ms = latency_budget_ms
+        self.aggregates = aggregates
         self.analyzer = QueryAnalyzer()
         
-    def search(self, query: str, top_k: int = 20) -> Dict:
+    def search(self, query: str, top_k: int = 20, latency_budget_ms: Optional[float] = None) -> Dict:
         """
         Main search method - This is where the magic happens!
         
@@ -41,7 +67,7 @@ class JobAgent:
         1. Analyzes the query to understand what user wants
         2. Plans which tools to use
         3. Executes the search strategy
-        4. Returns filtered results
+        4. Returns filtered results (+ how much searching it took)
         """
         
         # STEP 1: Analyze the query
@@ -50,40 +76,56 @@ class JobAgent:
         print(f"📊 Parsed query: {parsed_query}")
         
         # STEP 2: Execute search based on query type
+        comparison = None
         if parsed_query["query_type"] == "general_browse":
             # Simple case: user wants to browse all jobs
             print("📋 Strategy: Return all jobs (no filtering needed)")
             results = self.metadata[:top_k]
+            search_stats = {"iterations": 0, "candidates_examined": 0, "search_ms": 0.0, "stopped": "browse"}
             
         elif parsed_query["query_type"] == "comparison":
             # Special case: user wants to compare (future enhancement)
             print("📊 Strategy: Comparison query detected")
-            results = self._handle_comparison(parsed_query, top_k)
+            results, search_stats, comparison = self._handle_comparison(parsed_query, top_k)
             
         else:
             # Main case: Smart multi-step filtering
             print("🎯 Strategy: Multi-step filtered search")
-            results = self._multi_step_search(parsed_query, top_k)
+            budget = latency_budget_ms if latency_budget_ms is not None else self.latency_budget_ms
+            results, search_stats = self._multi_step_search(parsed_query, top_k, budget)
         
-        return {
+        response = {
             "jobs": results,
             "total_results": len(results),
             "parsed_query": parsed_query,
+            "search_stats": search_stats,
             "strategy": "agentic_rag"
         }
+        if comparison is not None:
+            response["comparison"] = comparison
+        return response
     
-    def _multi_step_search(self, parsed_query: Dict, top_k: int) -> List[Dict]:
+    def _multi_step_search(
+        self,
+        parsed_query: Dict,
+        top_k: int,
+        latency_budget_ms: Optional[float] = None
+    ) -> Tuple[List[Dict], Dict]:
         """
         The CORE of Agentic RAG - Multi-step intelligent search
         
         This method decides the ORDER of operations:
-        1. Start with vector search (cast a wide net)
-        2. Apply hard filters (salary, location, visa)
-        3. Rank by relevance
+        1. Start with a SMALL vector search
+        2. Apply hard filters (salary, location, visa, remote)
+        3. Too few survivors? Widen k geometrically and filter only the new candidates
+        
+        Stops when top_k jobs survive, the whole index has been examined, or the
+        next (wider) search would blow the latency budget.
+        Broad queries finish after one small search; selective ones keep widening.
         """
         
         # TOOL 1: Vector Search - Find semantically similar jobs
-        print("  🔍 Tool 1: Vector search for semantic similarity")
+        print("  🔍 Tool 1: Adaptive vector search for semantic similarity")
         
         # Create search query from skills
         if parsed_query["skills"]:
@@ -91,50 +133,95 @@ class JobAgent:
         else:
             search_text = parsed_query["original_query"]
         
-        # Get MORE candidates than we need (we'll filter down)
-        candidate_k = min(100, self.faiss_index.ntotal)  # Get up to 100 candidates
-        vector_results = self._vector_search(search_text, candidate_k)
-        print(f"    ✓ Found {len(vector_results)} candidates from vector search")
-        
-        # TOOL 2: Apply filters one by one
-        filtered_results = vector_results
+        # Embed ONCE - every widening step reuses the same query vector.
+        # Timed separately: the latency budget only covers the widening loop
+        embed_started = time.perf_counter()
+        query_vector = np.array([self.embed_fn(search_text)]).astype("float32")
+        embed_ms = (time.perf_counter() - embed_started) * 1000
         
-        # Filter by salary
+        # TOOLS 2-5: Which filters will run on each batch of candidates
         if parsed_query["salary_min"]:
             print(f"  💰 Tool 2: Filtering by salary >= £{parsed_query['salary_min']}")
-            filtered_results = self._filter_by_salary(
-                filtered_results, 
-                parsed_query["salary_min"],
-                parsed_query["salary_max"]
-            )
-            print(f"    ✓ {len(filtered_results)} jobs after salary filter")
-        
-        # Filter by location
         if parsed_query["location"]:
             print(f"  📍 Tool 3: Filtering by location = {parsed_query['location']}")
-            filtered_results = self._filter_by_location(
-                filtered_results,
-                parsed_query["location"]
-            )
-            print(f"    ✓ {len(filtered_results)} jobs after location filter")
-        
-        # Filter by visa sponsorship
         if parsed_query["visa_required"]:
             print(f"  🛂 Tool 4: Filtering by visa sponsorship")
-            filtered_results = self._filter_by_visa(filtered_results)
-            print(f"    ✓ {len(filtered_results)} jobs after visa filter")
-        
-        # Filter by remote preference
         if parsed_query["remote"]:
             print(f"  🏠 Tool 5: Filtering for remote jobs")
-            filtered_results = self._filter_by_remote(filtered_results)
-            print(f"    ✓ {len(filtered_results)} jobs after remote filter")
+        
+        # Sharded index: the location filter is strict, so only shards with jobs there are searched
+        search_options = {}
+        if parsed_query["location"] and hasattr(self.faiss_index, "shards_for_location"):
+            search_options["location"] = parsed_query["location"]
+        
+        total_jobs = self.faiss_index.ntotal
+        k = min(max(top_k, self.initial_k), total_jobs)
+        searched_k = 0  # Widest k searched so far
+        seen = set()    # Job ids already filtered - each candidate is examined once
+        iterations = 0
+        last_search_ms = 0.0
+        filtered_results = []
+        stopped = "exhausted"
+        started = time.perf_counter()
+        
+        while k > searched_k:
+            iterations += 1
+            search_started = time.perf_counter()
+            D, I = self.faiss_index.search(query_vector, k=k, **search_options)
+            
+            # Filter only jobs not seen before. Not a positional slice: a two-stage
+            # index reorders its shortlist as k grows, and a shard that timed out
+            # last time can answer now, so earlier results aren't a stable prefix
+            new_ids = []
+            for i in I[0]:
+                if 0 <= i < len(self.metadata) and i not in seen:
+                    seen.add(i)
+                    new_ids.append(i)
+            new_jobs = [self.metadata[i] for i in new_ids]
+            filtered_results.extend(self._apply_filters(new_jobs, parsed_query))
+            searched_k = k
+            last_search_ms = (time.perf_counter() - search_started) * 1000
+            print(f"    🔁 Iteration {iterations}: k={k} → {len(filtered_results)}/{top_k} jobs pass the filters")
+            
+            if len(filtered_results) >= top_k:
+                stopped = "enough_results"
+                break
+            if k >= total_jobs:
+                stopped = "exhausted"
+                break
+            
+            # Next search examines `growth`x more candidates - assume it costs ~that much more
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if latency_budget_ms is not None and elapsed_ms + last_search_ms * self.growth > latency_budget_ms:
+                stopped = "latency_budget"
+                break
+            k = min(int(k * self.growth), total_jobs)
         
         # Return top K results
         final_results = filtered_results[:top_k]
-        print(f"✅ Final results: {len(final_results)} jobs")
+        search_stats = {
+            "iterations": iterations,
+            "candidates_examined": len(seen),
+            "search_ms": (time.perf_counter() - started) * 1000,
+            "embed_ms": embed_ms,
+            "stopped": stopped
+        }
+        print(f"✅ Final results: {len(final_results)} jobs "
+              f"({iterations} searches, {len(seen)} candidates examined, stopped: {stopped})")
         
-        return final_results
+        return final_results, search_stats
+    
+    def _apply_filters(self, jobs: List[Dict], parsed_query: Dict) -> List[Dict]:
+        """Run every filter tool the parsed query asks for"""
+        if parsed_query["salary_min"]:
+            jobs = self._filter_by_salary(jobs, parsed_query["salary_min"], parsed_query["salary_max"])
+        if parsed_query["location"]:
+            jobs = self._filter_by_location(jobs, parsed_query["location"])
+        if parsed_query["visa_required"]:
+            jobs = self._filter_by_visa(jobs)
+        if parsed_query["remote"]:
+            jobs = self._filter_by_remote(jobs)
+        return jobs
     
     # ==========================================
     # TOOL IMPLEMENTATIONS
@@ -147,7 +234,7 @@ class JobAgent:
         This finds jobs that are semantically similar to the query
         """
         # Embed the query
-        query_vector = embed_text(query)
+        query_vector = self.embed_fn(query)
         
         # Search FAISS
         D, I = self.faiss_index.search(
@@ -156,7 +243,7 @@ class JobAgent:
         )
         
         # Return matching jobs
-        results = [self.metadata[i] for i in I[0] if i < len(self.metadata)]
+        results = [self.metadata[i] for i in I[0] if 0 <= i < len(self.metadata)]
         return results
     
     def _filter_by_salary(
@@ -173,22 +260,11 @@ class JobAgent:
         filtered = []
         
         for job in jobs:
-            salary_str = job.get('salary', '').lower()
-            
-            # Skip if no salary info
-            if not salary_str or salary_str == 'not specified':
-                continue
-            
-            # Extract salary number from string like "£60,000 - £80,000"
-            # Simple approach: find all numbers and take the first one
-            import re
-            numbers = re.findall(r'[\d,]+', salary_str)
-            if not numbers:
+            # Normalize "£60K-£80K" → (60000, 80000); skip if no salary info
+            job_salary, _ = parse_salary(job.get('salary', ''))
+            if job_salary is None:
                 continue
             
-            # Parse the first number (usually the minimum)
-            job_salary = int(numbers[0].replace(',', ''))
-            
             # Apply filters
             if min_salary and job_salary < min_salary:
                 continue
@@ -222,16 +298,8 @@ class JobAgent:
         """
         TOOL: Filter for jobs offering visa sponsorship
         """
-        filtered = []
-        
-        for job in jobs:
-            visa_info = job.get('visa_sponsorship', '').lower()
-            
-            # Check if visa is mentioned positively
-            if 'yes' in visa_info or 'available' in visa_info or 'sponsor' in visa_info:
-                filtered.append(job)
-        
-        return filtered
+        # "Not available" / "No sponsorship" don't count - see rag/visa.py
+        return [job for job in jobs if offers_visa_sponsorship(job.get('visa_sponsorship'))]
     
     def _filter_by_remote(self, jobs: List[Dict]) -> List[Dict]:
         """
@@ -249,15 +317,43 @@ class JobAgent:
         
         return filtered
     
-    def _handle_comparison(self, parsed_query: Dict, top_k: int) -> List[Dict]:
+    def _handle_comparison(self, parsed_query: Dict, top_k: int) -> Tuple[List[Dict], Dict, Optional[List[Dict]]]:
         """
-        TOOL: Handle comparison queries (future enhancement)
+        TOOL: Handle comparison queries with the precomputed salary cube
         
         Example: "Compare Python vs JavaScript salaries"
+        → one row per skill x location: salary percentiles, job count, visa rate
+        
+        Without a cube (or nothing to compare) falls back to a plain vector search.
         """
-        # For now, just return basic results
-        # In the future, this could do statistical analysis
-        return self._vector_search(parsed_query["original_query"], top_k)
+        started = time.perf_counter()
+        query_lower = parsed_query["original_query"].lower()
+        # The analyzer keeps only the FIRST city - comparisons can name several
+        locations = [city.title() for city in self.analyzer.uk_cities if city in query_lower]
+        if parsed_query["location"] == "Remote":
+            locations.append("Remote")
+        
+        if self.aggregates is not None and (parsed_query["skills"] or locations):
+            print(f"  📊 Tool 6: Salary cube lookup (skills={parsed_query['skills']}, locations={locations})")
+            comparison = self.aggregates.compare(parsed_query["skills"] or [None], locations or [None])
+            search_stats = {
+                "iterations": 0,
+                "candidates_examined": 0,
+                "search_ms": (time.perf_counter() - started) * 1000,
+                "stopped": "aggregates"
+            }
+            return [], search_stats, comparison
+        
+        # Nothing the cube can answer - return basic results
+        k = min(top_k, self.faiss_index.ntotal)
+        results = self._vector_search(parsed_query["original_query"], k)
+        search_stats = {
+            "iterations": 1,
+            "candidates_examined": k,
+            "search_ms": (time.perf_counter() - started) * 1000,
+            "stopped": "comparison"
+        }
+        return results, search_stats, None
 
 
 # ==========================================
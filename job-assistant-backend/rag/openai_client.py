@@ -0,0 +1,269 @@
+# chatgpt_clone/rag/openai_client.py
+"""
+Shared OpenAI Client - ONE client for the whole backend
+
+Every module (main.py, embedder, query analyzer) goes through this layer, which adds:
+- Connection pooling: a single httpx pool with keep-alive connections
+- Rate limiting: a client-side token bucket so bursts don't turn into 429 storms
+- Retries: exponential backoff with full jitter (honours Retry-After)
+- Single-flight: N concurrent IDENTICAL requests → 1 upstream call, shared result
+- Deadlines: `timeout=` bounds the WHOLE call (throttling, retries, back-off),
+  raising DeadlineExceeded instead of starting work that can't finish in time
+
+Configure with env vars (defaults in brackets):
+OPENAI_RPS [50], OPENAI_BURST [OPENAI_RPS], OPENAI_MAX_RETRIES [4],
+OPENAI_MAX_CONNECTIONS [20], OPENAI_BASE_URL (e.g. a local stub server)
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RETRY_BASE_DELAY = 0.5  # seconds
+RETRY_MAX_DELAY = 20.0  # seconds
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's time budget ran out before the upstream call could complete"""
+
+    def __init__(self, message: str, deadline: Optional[float] = None):
+        super().__init__(message)
+        self.deadline = deadline  # monotonic deadline of the call that gave up
+
+
+def _retryable_errors():
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,  # Includes APITimeoutError
+        openai.InternalServerError,
+    )
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests/second, bursts up to `capacity`.
+    When upstream says 429, `pause()` blocks everyone until the cool-down ends.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, deadline: Optional[float] = None) -> float:
+        """
+        Block until `tokens` are available. Returns seconds spent waiting.
+        Raises DeadlineExceeded if they won't be available before `deadline` (monotonic).
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            if deadline is not None and now + delay >= deadline:
+                raise DeadlineExceeded(f"Rate limiter would delay the call past its deadline ({delay:.2f}s)", deadline)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (shared back-off after a 429)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller does the
+    work, everyone else waits for and shares its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]):
+        """Returns (result, shared) - shared is True when another caller did the work"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class SharedOpenAIClient:
+    """Pooled, rate-limited, retrying, coalescing wrapper around openai.OpenAI"""
+
+    def __init__(self):
+        # Imported here so importing this module (and main.py) stays fast
+        import httpx
+        import openai
+
+        rps = float(os.getenv("OPENAI_RPS", "50"))
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+        max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+        self.client = openai.OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,  # We retry ourselves (with jitter + shared back-off)
+            http_client=httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
+        self._rate_limit_error = openai.RateLimitError
+        self._retryable_errors = _retryable_errors()
+        self.bucket = TokenBucket(rps, float(os.getenv("OPENAI_BURST", rps)))
+        self.single_flight = SingleFlight()
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "upstream_calls": 0,
+            "coalesced_calls": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "throttle_wait_seconds": 0.0,
+            "deadline_exceeded": 0,
+        }
+
+    def _count(self, key: str, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @staticmethod
+    def _request_key(kind: str, params: Dict) -> str:
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return kind + ":" + hashlib.sha1(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        value = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def _call_with_retries(self, fn: Callable[[], Any], deadline: Optional[float] = None):
+        attempt = 0
+        while True:
+            self._count("throttle_wait_seconds", self.bucket.acquire(deadline=deadline))
+            self._count("upstream_calls")
+            try:
+                return fn()
+            except self._retryable_errors as e:
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceeded("Upstream call did not finish before its deadline", deadline) from e
+                if attempt >= self.max_retries:
+                    raise
+                # Full jitter: sleep somewhere in [0, base * 2^attempt]
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                if isinstance(e, self._rate_limit_error):
+                    self._count("rate_limited")
+                    delay = max(delay, self._retry_after(e) or 0.0)
+                    self.bucket.pause(delay)  # Everyone backs off, not just this thread
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceeded("No time left to retry before the deadline", deadline) from e
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def _request(self, kind: str, fn: Callable[..., Any], params: Dict, timeout: Optional[float]):
+        key = self._request_key(kind, params)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        def call():
+            call_params = dict(params)
+            if deadline is not None:
+                # Each attempt only gets what is left of the overall budget
+                call_params["timeout"] = max(deadline - time.monotonic(), 0.001)
+            return fn(**call_params)
+
+        while True:
+            try:
+                result, shared = self.single_flight.do(
+                    key, lambda: self._call_with_retries(call, deadline)
+                )
+                break
+            except DeadlineExceeded as e:
+                # We joined an identical call whose caller had a SHORTER deadline -
+                # its give-up isn't ours, so make the call again with our own budget
+                if e.deadline is not None and (deadline is None or deadline > e.deadline):
+                    continue
+                raise
+        if shared:
+            self._count("coalesced_calls")
+        return result
+
+    def create_embedding(self, input, model: str = "text-embedding-3-small", timeout: Optional[float] = None):
+        """Same response object as client.embeddings.create (timeout = overall budget in seconds)"""
+        return self._request("embeddings", self.client.embeddings.create,
+                             {"model": model, "input": input}, timeout)
+
+    def create_chat_completion(self, timeout: Optional[float] = None, **params):
+        """Same response object as client.chat.completions.create (timeout = overall budget in seconds)"""
+        return self._request("chat", self.client.chat.completions.create, params, timeout)
+
+
+_shared_client: Optional[SharedOpenAIClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_openai_client() -> SharedOpenAIClient:
+    """Process-wide shared client (created on first use)"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = SharedOpenAIClient()
+    return _shared_client
+
+
+def peek_openai_client() -> Optional[SharedOpenAIClient]:
+    """The shared client if something already created it - never creates one"""
+    return _shared_client
@@ -0,0 +1,222 @@
+# chatgpt_clone/rag/profile_store.py
+"""
+Profile Store - Persistent user profiles with cached profile embeddings
+
+Profiles live in SQLite so they survive restarts and are shared by every
+uvicorn worker. The profile embedding is computed ONCE when the profile is
+saved, so personalizing a search is pure local math (no API call, no prompt tokens).
+"""
+
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from .salary import parse_salary
+from .visa import offers_visa_sponsorship
+
+
+def default_db_path() -> str:
+    # Default path: next to vector_index/, two directories up from this script
+    base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
+    return os.getenv("PROFILE_DB_PATH", os.path.join(base_dir, "profiles", "profiles.db"))
+
+
+_TRUE_VALUES = {"true", "yes", "y", "1"}
+_FALSE_VALUES = {"false", "no", "n", "0", ""}
+
+
+def parse_salary_min(value) -> Optional[int]:
+    """60000, "60000", "£60K" → 60000; None/"" → None. Raises ValueError otherwise"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"salary_min must be a number, got {value!r}")
+    if isinstance(value, (int, float)):
+        salary = int(value)
+    else:
+        salary, _ = parse_salary(str(value))
+        if salary is None:
+            raise ValueError(f"salary_min must be a number, got {value!r}")
+    if salary < 0:
+        raise ValueError(f"salary_min must not be negative, got {value!r}")
+    return salary
+
+
+def parse_flag(value, name: str) -> bool:
+    """true/false, "true"/"false", "yes"/"no", 1/0 → bool. Raises ValueError otherwise"""
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _TRUE_VALUES | _FALSE_VALUES:
+        return value.strip().lower() in _TRUE_VALUES
+    raise ValueError(f"{name} must be true or false, got {value!r}")
+
+
+def build_profile(preferences: Dict) -> Dict:
+    """
+    Extract (and validate) the structured preferences we re-rank on.
+    Raises ValueError on values that can't be coerced - the API turns it into a 422.
+    """
+    if not isinstance(preferences, dict):
+        raise ValueError("preferences must be an object")
+
+    tech_stack = preferences.get("tech_stack") or []
+    if isinstance(tech_stack, str):
+        tech_stack = tech_stack.split(",")  # "Python, AWS"
+    if not isinstance(tech_stack, list) or not all(isinstance(t, str) for t in tech_stack):
+        raise ValueError("tech_stack must be a list of strings")
+
+    notes = preferences.get("notes") or ""
+    if not isinstance(notes, str):
+        raise ValueError("notes must be a string")
+
+    return {
+        "preferences": preferences,
+        "tech_stack_preferences": [t.strip() for t in tech_stack if t.strip()],
+        "salary_min": parse_salary_min(preferences.get("salary_min")),
+        "company_size_preference": preferences.get("company_size"),
+        "visa_required": parse_flag(preferences.get("visa_required"), "visa_required"),
+        "notes": notes
+    }
+
+
+def profile_embedding_text(profile: Dict) -> str:
+    """Text that represents the profile in embedding space (same shape as job texts)"""
+    parts = [
+        ", ".join(profile.get("tech_stack_preferences") or []),
+        profile.get("notes") or "",
+    ]
+    return " | ".join(p for p in parts if p)
+
+
+class ProfileStore:
+    """
+    SQLite-backed profile storage
+
+    Each row holds the structured profile (JSON), its embedding (float32 blob)
+    and the config of the embedder that produced it - an embedding is only
+    comparable with job vectors from the same backend/dimension.
+    A new connection is opened per call, which keeps it safe across threads and workers.
+    Calls block (busy timeout 5 s) - run them in a worker thread from async code.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_db_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS profiles (
+                    user_id TEXT PRIMARY KEY,
+                    profile TEXT NOT NULL,
+                    embedding BLOB,
+                    embedder TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Databases created before the embedder column existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+            if "embedder" not in columns:
+                conn.execute("ALTER TABLE profiles ADD COLUMN embedder TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        return conn
+
+    def save(self, user_id: str, profile: Dict, embedding: Optional[List[float]] = None,
+             embedder_config: Optional[Dict] = None):
+        """Insert or replace a profile together with its precomputed embedding (and who made it)"""
+        blob = np.asarray(embedding, dtype="float32").tobytes() if embedding is not None else None
+        embedder = json.dumps(embedder_config) if embedder_config is not None else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO profiles (user_id, profile, embedding, embedder, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, json.dumps(profile), blob, embedder, time.time())
+            )
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        """
+        Load a profile. The embedding (if any) is returned under the
+        "embedding" key as a float32 numpy array, its embedder config under
+        "embedder" (None for profiles saved before it was recorded).
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT profile, embedding, embedder FROM profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        profile = json.loads(row[0])
+        profile["embedding"] = np.frombuffer(row[1], dtype="float32") if row[1] else None
+        profile["embedder"] = json.loads(row[2]) if row[2] else None
+        return profile
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+
+# ==========================================
+# LOCAL RE-RANKING
+# ==========================================
+
+# How much each profile signal moves a job (query similarity is in [-1, 1])
+PROFILE_SIMILARITY_WEIGHT = 0.5
+TECH_OVERLAP_WEIGHT = 0.3
+SALARY_BELOW_MIN_PENALTY = 0.3
+VISA_MISMATCH_PENALTY = 0.3
+
+
+def _cosine(vectors: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(vector) or 1.0)
+    return (vectors @ vector) / np.maximum(norms, 1e-12)
+
+
+def profile_scores(profile: Dict, jobs: List[Dict], job_vectors: np.ndarray) -> np.ndarray:
+    """
+    Score how well each job fits the profile (higher = better fit)
+
+    Uses only data cached at save time:
+    - cosine similarity between profile embedding and job vector
+    - fraction of the preferred tech stack the job mentions
+    - penalty when the job's normalized max salary is below salary_min
+    - penalty when visa sponsorship is required but not offered
+    """
+    scores = np.zeros(len(jobs), dtype="float32")
+    if not jobs:
+        return scores
+
+    embedding = profile.get("embedding")
+    # A profile embedded by another backend/dimension isn't comparable - skip similarity
+    if embedding is not None and len(job_vectors) and len(embedding) == job_vectors.shape[1]:
+        scores += PROFILE_SIMILARITY_WEIGHT * _cosine(job_vectors, embedding)
+
+    preferred_techs = {str(t).lower() for t in profile.get("tech_stack_preferences") or []}
+    try:
+        # Rows saved before build_profile validated its input can hold e.g. "60000" / "false"
+        salary_min = parse_salary_min(profile.get("salary_min"))
+        visa_required = parse_flag(profile.get("visa_required"), "visa_required")
+    except ValueError:
+        salary_min, visa_required = None, False
+
+    for idx, job in enumerate(jobs):
+        if preferred_techs:
+            job_techs = {t.lower() for t in job.get('tech_stack', [])}
+            scores[idx] += TECH_OVERLAP_WEIGHT * len(preferred_techs & job_techs) / len(preferred_techs)
+
+        if salary_min:
+            _, job_salary_max = parse_salary(job.get('salary'))
+            if job_salary_max is not None and job_salary_max < salary_min:
+                scores[idx] -= SALARY_BELOW_MIN_PENALTY
+
+        if visa_required and not offers_visa_sponsorship(job.get('visa_sponsorship')):
+            scores[idx] -= VISA_MISMATCH_PENALTY
+
+    return scores
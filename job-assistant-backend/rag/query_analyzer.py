@@ -5,13 +5,7 @@ This is the BRAIN that understands what the user wants
 """
 
 import re
-import openai
-import os
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
-
-load_dotenv()
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 class QueryAnalyzer:
@@ -1,10 +1,11 @@
 # chatgpt_clone/rag/rag_utils.py
-from .embedder import embed_text, load_and_embed_jobs
+from .embedder import get_embedder, embedder_config_from_env, load_and_embed_jobs
 from .retriever import create_faiss_index, save_faiss_index
 
 def build_vector_index():
     texts, metadata = load_and_embed_jobs()
-    embeddings = [embed_text(t) for t in texts]
+    embedder = get_embedder(embedder_config_from_env())
+    embeddings = embedder.embed_batch(texts)
     index = create_faiss_index(embeddings)
-    save_faiss_index(index, metadata)
+    save_faiss_index(index, metadata=metadata, info={"embedder": embedder.config()})
     print("✅ Vector index built and saved.")
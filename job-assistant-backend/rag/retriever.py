@@ -1,38 +1,124 @@
 # chatgpt_clone/rag/retriever.py
-import faiss
 import numpy as np
 import pickle
+import hashlib
+import json
 import os
+from .two_stage import vectors_path, load_two_stage_index
+from .sharding import load_sharded_index
 
-def save_faiss_index(index, path=None, metadata=None):
+def default_index_path():
+    # Default path: two directories up from this script, then into vector_index
+    # (VECTOR_INDEX_PATH points the server/builder at another index, e.g. a test one)
+    base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
+    return os.getenv("VECTOR_INDEX_PATH", os.path.join(base_dir, "vector_index", "faiss.index"))
+
+def index_info_path(path):
+    return path.replace(".index", ".info.json")
+
+def save_faiss_index(index, path=None, metadata=None, info=None, vectors=None):
+    """
+    Save the index, its metadata pickle and (optionally) an info JSON
+    describing how it was built, e.g. {"embedder": {"backend": "openai", ...}}.
+    Full-dimension `vectors` are saved as .npy so they can be memory-mapped.
+    """
     if path is None:
-        # Default path: two directories up from this script, then into vector_index
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
-        path = os.path.join(base_dir, "vector_index", "faiss.index")
+        path = default_index_path()
     
     path = str(path)  # ✅ Ensure it's a string
     os.makedirs(os.path.dirname(path), exist_ok=True)  # ✅ Ensure directory exists
 
-    faiss.write_index(index, path)
+    if index is not None:  # Sharded builds write their shards separately
+        import faiss
+        faiss.write_index(index, path)
 
     meta_path = path.replace(".index", ".meta.pkl")
     with open(meta_path, "wb") as f:
         pickle.dump(metadata, f)
 
+    if info is not None:
+        with open(index_info_path(path), "w") as f:
+            json.dump(info, f, indent=2)
 
-def load_faiss_index(path=None):
+    if vectors is not None:
+        np.save(vectors_path(path), np.asarray(vectors, dtype="float32"))
+
+
+def load_metadata(path=None):
+    """Job metadata list; every job gets an "id" = its row in the index"""
     if path is None:
-        # Default path: two directories up from this script, then into vector_index
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "..")
-        path = os.path.join(base_dir, "vector_index", "faiss.index")
-    
-    index = faiss.read_index(path)
+        path = default_index_path()
+
     meta_path = path.replace(".index", ".meta.pkl")
     with open(meta_path, "rb") as f:
         metadata = pickle.load(f)
+    for job_id, job in enumerate(metadata):
+        job.setdefault("id", job_id)  # Indexes built before ids were stored
+    return metadata
+
+def load_faiss_index(path=None):
+    if path is None:
+        path = default_index_path()
+    
+    metadata = load_metadata(path)
+
+    info = load_index_info(path)
+    if info.get("index_mode") == "sharded":
+        # Shards live in their own processes; this one only coordinates
+        return load_sharded_index(path, info["shards"], vectors=load_job_vectors(path)), metadata
+
+    import faiss  # Imported lazily - it's heavy and only needed once the index loads
+    index = faiss.read_index(path)
+    # Two-stage indexes: `index` is the low-dim first stage, wrap it with the re-ranker
+    if info.get("index_mode") == "two_stage":
+        index = load_two_stage_index(index, path, info["first_stage"])
     return index, metadata
 
-def create_faiss_index(vectors: list):
+def load_job_vectors(path=None, index=None):
+    """
+    Full-dimension job vectors, memory-mapped from the .npy saved at build time
+    (rows are only read when touched). Falls back to reconstructing them from
+    `index` for indexes built before vectors were saved.
+    """
+    if path is None:
+        path = default_index_path()
+
+    if os.path.exists(vectors_path(path)):
+        return np.load(vectors_path(path), mmap_mode="r")
+    if index is not None:
+        return index.reconstruct_n(0, index.ntotal)
+    return None
+
+def load_index_info(path=None):
+    """Build info saved next to the index ({} for indexes built before it existed)"""
+    if path is None:
+        path = default_index_path()
+
+    info_path = index_info_path(path)
+    if not os.path.exists(info_path):
+        return {}
+    with open(info_path) as f:
+        return json.load(f)
+
+def get_index_version(path=None):
+    """
+    Short content hash of the index + metadata files on disk.
+    Changes whenever the index is rebuilt, so it can key HTTP caches (ETags).
+    """
+    if path is None:
+        path = default_index_path()
+
+    digest = hashlib.sha1()
+    for file_path in (path, path.replace(".index", ".meta.pkl"), index_info_path(path)):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def create_faiss_index(vectors):
+    import faiss
     dimension = len(vectors[0])
     index = faiss.IndexFlatL2(dimension)
     index.add(np.array(vectors).astype("float32"))
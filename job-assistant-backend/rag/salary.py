@@ -0,0 +1,51 @@
+# chatgpt_clone/rag/salary.py
+"""
+Salary Normalizer - Turns free-text salaries into annual numbers
+"£60K-£75K", "£45,000 a year", "£25 per hour" → (min, max) in £/year
+"""
+
+import re
+from typing import Optional, Tuple
+
+# "60", "60,000", "60.5" optionally followed by "k"
+_AMOUNT_PATTERN = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*(k\b)?', re.IGNORECASE)
+
+HOURS_PER_YEAR = 1950  # 37.5h x 52 weeks
+DAYS_PER_YEAR = 230    # typical contractor working days
+
+
+def parse_salary(salary: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Normalize a salary string into an annual (min, max) pair
+
+    Examples:
+    - "£60K-£75K"      → (60000, 75000)
+    - "£45,000"        → (45000, 45000)
+    - "£500 per day"   → (115000, 115000)
+    - "Not specified"  → (None, None)
+    """
+    if not salary:
+        return None, None
+
+    salary_lower = str(salary).lower()
+    amounts = []
+    for number, k_suffix in _AMOUNT_PATTERN.findall(salary_lower):
+        value = float(number.replace(',', ''))
+        if k_suffix:
+            value *= 1000
+        amounts.append(value)
+
+    if not amounts:
+        return None, None
+
+    # Convert hourly / daily rates to annual figures
+    if 'hour' in salary_lower or '/hr' in salary_lower:
+        amounts = [a * HOURS_PER_YEAR for a in amounts]
+    elif 'day' in salary_lower:
+        amounts = [a * DAYS_PER_YEAR for a in amounts]
+    else:
+        # Bare small numbers like "60 - 75" are almost always thousands
+        amounts = [a * 1000 if a < 1000 else a for a in amounts]
+
+    low, high = amounts[0], amounts[1] if len(amounts) > 1 else amounts[0]
+    return int(min(low, high)), int(max(low, high))
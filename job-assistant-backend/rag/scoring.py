@@ -0,0 +1,157 @@
+# chatgpt_clone/rag/scoring.py
+"""
+Candidate Scorer - Vectorized keyword scoring for /chat
+
+Everything that depends only on the jobs (lowercased locations, tech stacks,
+title/company tokens) is precomputed ONCE at load time into NumPy arrays.
+Scoring a query is then a handful of array operations over the whole
+candidate set (or the whole corpus) instead of a Python loop per job.
+"""
+
+import os
+import numpy as np
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+
+UK_CITIES = ['manchester', 'birmingham', 'edinburgh', 'glasgow', 'bristol', 'cambridge',
+             'oxford', 'leeds', 'liverpool', 'sheffield', 'nottingham', 'cardiff']
+
+COMMON_TECHS = ['python', 'java', 'javascript', 'typescript', 'react', 'node', 'aws', 'kubernetes',
+                'docker', 'sql', 'nosql', 'mongodb', 'postgres', 'redis', 'kafka', 'scala', 'kotlin',
+                'swift', 'go', 'rust', 'c++', 'c#', '.net', 'django', 'flask', 'spring', 'angular', 'vue']
+
+
+@dataclass
+class ScoringWeights:
+    """
+    Points added per signal. Override any of them with an env var,
+    e.g. SCORING_LOCATION_MATCH=150 or SCORING_TITLE_MATCH=8
+    """
+    location_match: float = 100     # Job is in a city named in the query
+    location_mismatch: float = -50  # Query names a city, job is in London instead
+    tech_match: float = 10          # Per query tech found in the job's tech stack
+    title_match: float = 5          # Per query word found in the title
+    company_match: float = 3        # Per query word found in the company name
+
+    @classmethod
+    def from_env(cls) -> "ScoringWeights":
+        overrides = {}
+        for field in fields(cls):
+            value = os.getenv(f"SCORING_{field.name.upper()}")
+            if value is not None:
+                overrides[field.name] = float(value)
+        return cls(**overrides)
+
+
+class _TokenIndex:
+    """
+    Inverted index of whitespace tokens → jobs, stored as two flat int32 arrays
+    (postings_jobs[i] contains token postings_tokens[i]).
+
+    "word in text" is equivalent to "word is a substring of some token" as long
+    as the word has no whitespace, so substring matching only has to scan the
+    (small) vocabulary, never the jobs.
+    """
+
+    def __init__(self, texts: Sequence[str]):
+        self.vocab: Dict[str, int] = {}
+        job_ids, token_ids = [], []
+        for job_id, text in enumerate(texts):
+            for token in set(text.split()):
+                token_ids.append(self.vocab.setdefault(token, len(self.vocab)))
+                job_ids.append(job_id)
+
+        self.num_jobs = len(texts)
+        self.tokens = list(self.vocab)
+        self.postings_jobs = np.asarray(job_ids, dtype="int32")
+        self.postings_tokens = np.asarray(token_ids, dtype="int32")
+        self._matching_tokens = lru_cache(maxsize=4096)(self._compute_matching_tokens)
+
+    def _compute_matching_tokens(self, word: str) -> np.ndarray:
+        hits = np.zeros(len(self.tokens), dtype=bool)
+        for token_id, token in enumerate(self.tokens):
+            if word in token:
+                hits[token_id] = True
+        return hits
+
+    def contains(self, word: str) -> np.ndarray:
+        """Boolean mask over all jobs: does `word` occur in the job's text?"""
+        token_hits = self._matching_tokens(word)
+        if not len(self.postings_tokens):
+            return np.zeros(self.num_jobs, dtype=bool)
+        matched_jobs = self.postings_jobs[token_hits[self.postings_tokens]]
+        return np.bincount(matched_jobs, minlength=self.num_jobs) > 0
+
+
+class CandidateScorer:
+    """
+    Precomputes per-job feature arrays:
+    - tech_matrix:  (jobs x COMMON_TECHS) one-hot, "tech in joined tech stack"
+    - city_matrix:  (jobs x UK_CITIES) one-hot, "city in location"
+    - in_london:    (jobs,) location mentions London
+    - title/company token indexes for free-text query words
+    """
+
+    def __init__(self, metadata: List[Dict], weights: Optional[ScoringWeights] = None):
+        self.weights = weights or ScoringWeights()
+        self.num_jobs = len(metadata)
+
+        locations = [job.get('location', '').lower() for job in metadata]
+        tech_strings = [' '.join(t.lower() for t in job.get('tech_stack', [])) for job in metadata]
+
+        self.tech_matrix = np.array(
+            [[tech in stack for tech in COMMON_TECHS] for stack in tech_strings], dtype=bool
+        ).reshape(self.num_jobs, len(COMMON_TECHS))
+        self.city_matrix = np.array(
+            [[city in location for city in UK_CITIES] for location in locations], dtype=bool
+        ).reshape(self.num_jobs, len(UK_CITIES))
+        self.in_london = np.array(['london' in location for location in locations], dtype=bool)
+
+        self.titles = _TokenIndex([job.get('title', '').lower() for job in metadata])
+        self.companies = _TokenIndex([job.get('company', '').lower() for job in metadata])
+
+    @staticmethod
+    def extract_keywords(query: str) -> Dict[str, List[str]]:
+        """Pull location, tech and free-text keywords out of a query"""
+        query_lower = query.lower()
+        return {
+            "locations": [city for city in UK_CITIES if city in query_lower],
+            "techs": [tech for tech in COMMON_TECHS if tech in query_lower],
+            "words": [w for w in query_lower.split() if len(w) > 3],  # Skip short words
+        }
+
+    def score(self, query: str, candidate_ids: Optional[np.ndarray] = None,
+              keywords: Optional[Dict[str, List[str]]] = None) -> np.ndarray:
+        """
+        Score jobs against the query in one vectorized pass
+
+        Returns float32 scores aligned with `candidate_ids`
+        (or with the whole corpus when no candidates are given)
+        """
+        keywords = keywords or self.extract_keywords(query)
+        w = self.weights
+        scores = np.zeros(self.num_jobs, dtype="float32")
+
+        # Location matching (highest priority)
+        if keywords["locations"]:
+            city_ids = [UK_CITIES.index(city) for city in keywords["locations"]]
+            location_match = self.city_matrix[:, city_ids].any(axis=1)
+            penalize = self.in_london if 'london' not in keywords["locations"] else np.zeros_like(self.in_london)
+            scores += np.where(location_match, w.location_match,
+                               np.where(penalize, w.location_mismatch, 0.0))
+
+        # Tech stack matching
+        if keywords["techs"]:
+            tech_ids = [COMMON_TECHS.index(tech) for tech in keywords["techs"]]
+            scores += self.tech_matrix[:, tech_ids].sum(axis=1) * w.tech_match
+
+        # Title / company matching
+        for word in keywords["words"]:
+            scores += self.titles.contains(word) * w.title_match
+            scores += self.companies.contains(word) * w.company_match
+
+        if candidate_ids is None:
+            return scores
+        return scores[np.asarray(candidate_ids, dtype="int64")]
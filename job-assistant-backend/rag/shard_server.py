@@ -0,0 +1,136 @@
+# chatgpt_clone/rag/shard_server.py
+"""
+Shard Server - Serves ONE index shard over a tiny RPC
+
+Protocol (multiprocessing.connection, pickled tuples, authkey-protected):
+    ("search", queries, k) → ("ok", D, I)     I holds GLOBAL job ids
+    ("ping",)              → ("ok", ntotal, d)
+
+Runs as a local child process (spawned by the coordinator, random per-run key)
+or standalone on another box. Messages are pickled, so a standalone server
+refuses to start without SHARD_AUTHKEY and only listens on 127.0.0.1 unless
+told otherwise - only expose it on a trusted network.
+
+    SHARD_AUTHKEY=... python -m rag.shard_server --index ../vector_index/faiss.shards/shard_0.index --port 7001
+"""
+
+import argparse
+import os
+import socket
+import threading
+import numpy as np
+from multiprocessing.connection import AuthenticationError, Listener, answer_challenge, deliver_challenge
+
+AUTH_TIMEOUT = 5.0  # seconds a new connection gets to complete the handshake
+
+
+def shard_ids_path(shard_index_path: str) -> str:
+    return shard_index_path.replace(".index", ".ids.npy")
+
+
+def shard_authkey(required: bool = False):
+    """SHARD_AUTHKEY as bytes; None if unset (RuntimeError if `required`)"""
+    key = os.getenv("SHARD_AUTHKEY")
+    if not key and required:
+        raise RuntimeError("SHARD_AUTHKEY must be set for remote/standalone shards (RPC messages are pickled)")
+    return key.encode() if key else None
+
+
+def _shutdown_quietly(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _authenticate(conn, authkey: bytes, timeout: float = AUTH_TIMEOUT) -> bool:
+    """
+    The HMAC handshake Listener(authkey=...) would run inside accept(), done
+    per connection instead, so a bad or silent client can't stall or crash
+    the accept loop. Shutting the socket down wakes a handshake stuck in recv.
+    """
+    sock = socket.socket(fileno=os.dup(conn.fileno()))
+    timer = threading.Timer(timeout, _shutdown_quietly, args=(sock,))
+    timer.start()
+    try:
+        deliver_challenge(conn, authkey)
+        answer_challenge(conn, authkey)
+        return True
+    except (AuthenticationError, EOFError, OSError):
+        return False
+    finally:
+        timer.cancel()
+        sock.close()  # Closes the dup only
+
+
+def _handle_connection(conn, authkey, index, global_ids):
+    with conn:
+        if not _authenticate(conn, authkey):
+            return
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return  # Coordinator went away (or dropped us after a timeout)
+
+            try:
+                if message[0] == "search":
+                    _, queries, k = message
+                    k = min(int(k), index.ntotal)
+                    if k <= 0:
+                        D = np.zeros((len(queries), 0), dtype="float32")
+                        I = np.zeros((len(queries), 0), dtype="int64")
+                    else:
+                        D, local_ids = index.search(np.asarray(queries, dtype="float32"), k)
+                        # Local row → global job id (keep faiss' -1 padding)
+                        I = np.where(local_ids >= 0, global_ids[np.maximum(local_ids, 0)], -1)
+                    conn.send(("ok", D, I))
+                elif message[0] == "ping":
+                    conn.send(("ok", index.ntotal, index.d))
+                else:
+                    conn.send(("error", f"unknown command {message[0]!r}"))
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                conn.send(("error", str(e)))
+
+
+def serve_shard(shard_index_path: str, address=("127.0.0.1", 0), authkey: bytes = None, ready=None):
+    """
+    Load the shard and serve forever. `ready` (a Connection) receives the
+    bound address once the shard is loaded and listening.
+    """
+    import faiss
+
+    if not authkey:
+        raise ValueError("serve_shard needs an authkey")
+
+    index = faiss.read_index(shard_index_path)
+    global_ids = np.load(shard_ids_path(shard_index_path)).astype("int64")
+
+    # No authkey here: the handshake runs in the per-connection thread (see _authenticate)
+    with Listener(address) as listener:
+        if ready is not None:
+            ready.send(listener.address)
+            ready.close()
+        print(f"🧩 Shard {os.path.basename(shard_index_path)} ({index.ntotal} jobs) on {listener.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                print(f"⚠️  Shard accept failed: {e}")
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, authkey, index, global_ids), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one FAISS index shard")
+    parser.add_argument("--index", required=True, help="Path to shard_N.index")
+    parser.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to accept remote coordinators")
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+    serve_shard(args.index, (args.host, args.port), shard_authkey(required=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# chatgpt_clone/rag/sharding.py
+"""
+Sharded Index - Partition the corpus and scatter-gather searches
+
+Build time:  partition jobs by hash (of the job's content) or by location/region
+             and write one FAISS index + global-id map per shard.
+Query time:  ShardedIndex fans each search out to shard processes (local
+             children or remote `rag.shard_server`s), merges the top-k and
+             returns the same (D, I) as a single FAISS index - /chat and
+             JobAgent apply their filters on top exactly as before.
+             Shards that miss the deadline (or error) are skipped: partial
+             results beat no results.
+             A search with a `location` (JobAgent's hard location filter) only
+             goes to the shards holding jobs in a matching location.
+"""
+
+import os
+import json
+import hashlib
+import secrets
+import zlib
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing.connection import Client
+from typing import Dict, List, Optional
+from .shard_server import serve_shard, shard_ids_path, shard_authkey
+
+
+def shards_dir(index_path: str) -> str:
+    return index_path.replace(".index", ".shards")
+
+
+def shard_index_path(index_path: str, shard: int) -> str:
+    return os.path.join(shards_dir(index_path), f"shard_{shard}.index")
+
+
+# ==========================================
+# BUILD: PARTITIONING
+# ==========================================
+
+def _region(job: Dict) -> str:
+    # "Manchester, UK" → "manchester"
+    return (job.get('location') or 'unknown').split(',')[0].strip().lower() or 'unknown'
+
+
+# Everything the builder stores about a job - `link` alone is NOT unique
+# (scraped jobs often all carry the same search-page URL)
+_KEY_FIELDS = ('title', 'company', 'salary', 'tech_stack', 'location',
+               'visa_sponsorship', 'link', 'full_description')
+
+
+def job_key(job: Dict) -> str:
+    """Stable identity of a job across rebuilds: a hash of its content"""
+    content = json.dumps([job.get(field) for field in _KEY_FIELDS], sort_keys=True, default=str)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def _location_shards(metadata: List[Dict], assignments: np.ndarray) -> Dict[str, List[int]]:
+    """Lowercased location string → shards holding jobs there (for routing)"""
+    owners: Dict[str, set] = {}
+    for job, shard in zip(metadata, assignments):
+        owners.setdefault(str(job.get('location') or '').lower(), set()).add(int(shard))
+    return {location: sorted(shards) for location, shards in owners.items()}
+
+
+def partition_jobs(metadata: List[Dict], num_shards: int, by: str = "hash") -> Dict:
+    """
+    Returns {"assignments": shard id per job, "locations": {location: [shards]}}
+
+    - hash:     crc32(job_key) % num_shards - stable across rebuilds
+    - location: whole regions per shard, biggest regions placed first on the
+                emptiest shard, so a region's jobs always live together and a
+                location-filtered search only needs that region's shard
+    """
+    if by == "hash":
+        keys = [job_key(job) for job in metadata]
+        assignments = np.array([zlib.crc32(k.encode()) % num_shards for k in keys], dtype="int32")
+        return {"assignments": assignments, "locations": _location_shards(metadata, assignments)}
+
+    if by != "location":
+        raise ValueError(f"Unknown shard strategy '{by}' (use 'hash' or 'location')")
+
+    regions = [_region(job) for job in metadata]
+    sizes: Dict[str, int] = {}
+    for region in regions:
+        sizes[region] = sizes.get(region, 0) + 1
+
+    shard_sizes = [0] * num_shards
+    region_to_shard = {}
+    for region, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        shard = int(np.argmin(shard_sizes))
+        region_to_shard[region] = shard
+        shard_sizes[shard] += size
+
+    assignments = np.array([region_to_shard[r] for r in regions], dtype="int32")
+    return {"assignments": assignments, "locations": _location_shards(metadata, assignments)}
+
+
+def write_shards(vectors: np.ndarray, assignments: np.ndarray, index_path: str, num_shards: int) -> List[int]:
+    """Write shard_N.index + shard_N.ids.npy for every shard; returns shard sizes"""
+    import faiss
+
+    os.makedirs(shards_dir(index_path), exist_ok=True)
+    sizes = []
+    for shard in range(num_shards):
+        ids = np.flatnonzero(assignments == shard).astype("int64")
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        if len(ids):
+            index.add(np.ascontiguousarray(vectors[ids], dtype="float32"))
+        path = shard_index_path(index_path, shard)
+        faiss.write_index(index, path)
+        np.save(shard_ids_path(path), ids)
+        sizes.append(len(ids))
+    return sizes
+
+
+# ==========================================
+# QUERY: SCATTER-GATHER COORDINATOR
+# ==========================================
+
+class ShardClient:
+    """
+    Pooled connections to one shard, so concurrent searches don't queue behind
+    each other. A timed-out connection is closed (its late reply is discarded).
+    """
+
+    def __init__(self, address, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _request(self, message, timeout: float):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+
+        try:
+            conn.send(message)
+            if not conn.poll(timeout):
+                raise TimeoutError(f"shard {self.address} timed out")
+            reply = conn.recv()
+        except BaseException:
+            conn.close()
+            raise
+
+        with self._lock:
+            self._idle.append(conn)
+        if reply[0] != "ok":
+            raise RuntimeError(f"shard {self.address}: {reply[1]}")
+        return reply[1:]
+
+    def search(self, queries: np.ndarray, k: int, timeout: float):
+        return self._request(("search", queries, k), timeout)
+
+    def ping(self, timeout: float = 30.0):
+        return self._request(("ping",), timeout)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class ShardedIndex:
+    """
+    Drop-in for a FAISS index (`search`, `ntotal`, `d`, `reconstruct_n`).
+    Results from shards that miss `timeout` seconds are left out.
+    `locations` ({location: [shards]}, written by the builder) enables routing.
+    """
+
+    def __init__(self, clients: List[ShardClient], timeout: float = 0.5,
+                 vectors: Optional[np.ndarray] = None, processes=None,
+                 locations: Optional[Dict[str, List[int]]] = None):
+        self.clients = clients
+        self.timeout = timeout
+        self.vectors = vectors
+        self.processes = processes or []
+        self.locations = locations
+        # Several in-flight searches per shard (one pooled connection each)
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 8 * len(clients)), thread_name_prefix="shard")
+
+        sizes = [client.ping() for client in clients]
+        self.ntotal = sum(ntotal for ntotal, _ in sizes)
+        self.d = sizes[0][1] if sizes else 0
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"shards": len(clients), "searches": 0, "partial_searches": 0, "shard_failures": 0,
+                      "routed_searches": 0, "shards_skipped": 0}
+
+    def reconstruct_n(self, start: int, n: int) -> np.ndarray:
+        if self.vectors is None:
+            raise RuntimeError("Sharded index was loaded without the full vectors file")
+        return np.asarray(self.vectors[start:start + n], dtype="float32")
+
+    def shards_for_location(self, location: str) -> Optional[List[int]]:
+        """
+        Shards holding a job whose location contains `location` (same test as
+        JobAgent's location filter); None = unknown layout, ask every shard
+        """
+        if self.locations is None:
+            return None
+        location_lower = location.lower()
+        return sorted({shard for job_location, shards in self.locations.items()
+                       if location_lower in job_location for shard in shards})
+
+    def search(self, queries: np.ndarray, k: int, timeout: Optional[float] = None,
+               location: Optional[str] = None):
+        """
+        `timeout` (seconds) can only shorten SHARD_TIMEOUT_MS, e.g. to a request's remaining budget.
+        `location` limits the fan-out to shards with matching jobs - only pass it when
+        results outside that location are filtered out anyway.
+        """
+        queries = np.asarray(queries, dtype="float32")
+        timeout = self.timeout if timeout is None else max(min(timeout, self.timeout), 0.001)
+        shards = self.shards_for_location(location) if location else None
+        clients = self.clients if shards is None else [self.clients[shard] for shard in shards]
+        futures = [self._pool.submit(client.search, queries, k, timeout) for client in clients]
+        # Small grace period on top of the per-shard timeout for thread scheduling
+        done, _ = wait(futures, timeout=timeout + 0.05)
+
+        D_parts, I_parts, failed = [], [], 0
+        for future in futures:
+            if future not in done or future.exception() is not None:
+                failed += 1
+                continue
+            D, I = future.result()
+            D_parts.append(D)
+            I_parts.append(I)
+
+        with self._stats_lock:
+            self.stats["searches"] += 1
+            self.stats["shard_failures"] += failed
+            self.stats["partial_searches"] += 1 if failed else 0
+            if shards is not None:
+                self.stats["routed_searches"] += 1
+                self.stats["shards_skipped"] += len(self.clients) - len(clients)
+
+        # Merge: global top-k by distance across all shard results
+        D_out = np.full((len(queries), k), np.inf, dtype="float32")
+        I_out = np.full((len(queries), k), -1, dtype="int64")
+        if not D_parts:
+            return D_out, I_out
+
+        D_all = np.hstack(D_parts)
+        I_all = np.hstack(I_parts)
+        D_all = np.where(I_all >= 0, D_all, np.inf)
+        best = np.argsort(D_all, axis=1, kind="stable")[:, :k]
+        rows = np.arange(len(queries))[:, None]
+        width = best.shape[1]
+        D_out[:, :width] = D_all[rows, best]
+        I_out[:, :width] = np.where(np.isfinite(D_all[rows, best]), I_all[rows, best], -1)
+        return D_out, I_out
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        for process in self.processes:
+            process.terminate()
+        self._pool.shutdown(wait=False)
+
+
+def start_local_shards(index_path: str, count: int):
+    """
+    Spawn one shard server process per shard on 127.0.0.1.
+    Returns (addresses, processes, authkey) - the key is SHARD_AUTHKEY or random per run.
+    """
+    context = multiprocessing.get_context("spawn")  # Don't fork faiss/OpenMP state
+    authkey = shard_authkey() or secrets.token_bytes(32)
+    addresses, processes, pipes = [], [], []
+    for shard in range(count):
+        parent_end, child_end = context.Pipe(duplex=False)
+        process = context.Process(
+            target=serve_shard,
+            args=(shard_index_path(index_path, shard), ("127.0.0.1", 0), authkey, child_end),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+        pipes.append(parent_end)
+
+    for parent_end in pipes:
+        addresses.append(parent_end.recv())
+        parent_end.close()
+    return addresses, processes, authkey
+
+
+def load_sharded_index(index_path: str, settings: Dict, vectors=None) -> ShardedIndex:
+    """
+    SHARD_ADDRESSES="host:port,host:port" → connect to remote shard servers
+    (one per shard, in order); otherwise spawn local shard processes.
+    SHARD_TIMEOUT_MS bounds how long a search waits for slow shards.
+    """
+    timeout = float(os.getenv("SHARD_TIMEOUT_MS", "500")) / 1000
+    remote = os.getenv("SHARD_ADDRESSES")
+    processes = []
+    if remote:
+        authkey = shard_authkey(required=True)
+        addresses = []
+        for address in remote.split(","):
+            host, port = address.strip().rsplit(":", 1)
+            addresses.append((host, int(port)))
+    else:
+        addresses, processes, authkey = start_local_shards(index_path, settings["count"])
+
+    clients = [ShardClient(address, authkey) for address in addresses]
+    return ShardedIndex(clients, timeout=timeout, vectors=vectors, processes=processes,
+                        locations=settings.get("locations"))
@@ -0,0 +1,127 @@
+# chatgpt_clone/rag/similar_jobs.py
+"""
+Similar Jobs - Precomputed k-NN table for "similar jobs" lookups
+
+The build computes every job's k nearest neighbours with batched matrix
+searches and stores them as a compact table:
+- neighbours: int32   (num_jobs x k), -1 = no neighbour
+- distances:  float16 (num_jobs x k), squared L2
+
+Serving "similar to job 42" is then a row lookup - no embedding, no FAISS search.
+When jobs are appended the table is EXTENDED: only the new rows are searched,
+and old rows just merge in any new job that beats their current neighbours.
+"""
+
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+def knn_table_path(index_path: str) -> str:
+    return index_path.replace(".index", ".knn.npz")
+
+
+def _search(corpus: np.ndarray, queries: np.ndarray, k: int, batch_size: int):
+    """Batched exact k-NN of `queries` against `corpus`"""
+    import faiss
+
+    index = faiss.IndexFlatL2(corpus.shape[1])
+    index.add(np.ascontiguousarray(corpus, dtype="float32"))
+    k = min(k, index.ntotal)
+
+    D_parts, I_parts = [], []
+    for start in range(0, len(queries), batch_size):
+        batch = np.ascontiguousarray(queries[start:start + batch_size], dtype="float32")
+        D, I = index.search(batch, k)
+        D_parts.append(D)
+        I_parts.append(I)
+    if not D_parts:
+        return np.zeros((0, k), dtype="float32"), np.zeros((0, k), dtype="int64")
+    return np.vstack(D_parts), np.vstack(I_parts)
+
+
+def _top_k(D: np.ndarray, I: np.ndarray, k: int):
+    """Keep the k closest per row, padding with (-1, inf)"""
+    D = np.where(I >= 0, D, np.inf)
+    order = np.argsort(D, axis=1, kind="stable")[:, :k]
+    rows = np.arange(len(D))[:, None]
+    D, I = D[rows, order], I[rows, order]
+
+    pad = k - D.shape[1]
+    if pad > 0:
+        D = np.hstack([D, np.full((len(D), pad), np.inf, dtype=D.dtype)])
+        I = np.hstack([I, np.full((len(I), pad), -1, dtype=I.dtype)])
+    I = np.where(np.isfinite(D), I, -1)
+    return D, I
+
+
+class SimilarJobsTable:
+    """O(1) "similar jobs" lookups from a precomputed neighbour table"""
+
+    def __init__(self, neighbours: np.ndarray, distances: np.ndarray):
+        self.neighbours = neighbours.astype("int32", copy=False)
+        self.distances = distances.astype("float16", copy=False)
+
+    @property
+    def num_jobs(self) -> int:
+        return len(self.neighbours)
+
+    @property
+    def k(self) -> int:
+        return self.neighbours.shape[1]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, k: int = 10, batch_size: int = 1024) -> "SimilarJobsTable":
+        """Full k-NN graph over the corpus (each job's own row is excluded)"""
+        vectors = np.asarray(vectors, dtype="float32")
+        D, I = _search(vectors, vectors, k + 1, batch_size)
+        # Drop self-matches (ties with exact duplicates may put self anywhere)
+        D = np.where(I == np.arange(len(I))[:, None], np.inf, D)
+        D, I = _top_k(D, I, k)
+        return cls(I, D)
+
+    def extend(self, vectors: np.ndarray, batch_size: int = 1024) -> "SimilarJobsTable":
+        """
+        Add rows for vectors[num_jobs:] (jobs appended since the table was built)
+
+        - new rows: k-NN against the full corpus
+        - old rows: k-NN against the NEW jobs only, merged with the existing row
+        """
+        vectors = np.asarray(vectors, dtype="float32")
+        old_count, k = self.num_jobs, self.k
+        if len(vectors) <= old_count:
+            return self
+        new_vectors = vectors[old_count:]
+
+        D_new, I_new = _search(vectors, new_vectors, k + 1, batch_size)
+        self_ids = np.arange(old_count, len(vectors))[:, None]
+        D_new, I_new = _top_k(np.where(I_new == self_ids, np.inf, D_new), I_new, k)
+
+        if old_count:
+            D_cross, I_cross = _search(new_vectors, vectors[:old_count], k, batch_size)
+            I_cross = np.where(I_cross >= 0, I_cross + old_count, -1)  # New-job local → global ids
+            D_old, I_old = _top_k(
+                np.hstack([self.distances.astype("float32"), D_cross]),
+                np.hstack([self.neighbours.astype("int64"), I_cross]),
+                k,
+            )
+        else:
+            D_old, I_old = np.zeros((0, k), dtype="float32"), np.zeros((0, k), dtype="int64")
+
+        return SimilarJobsTable(np.vstack([I_old, I_new]), np.vstack([D_old, D_new]))
+
+    def lookup(self, job_id: int, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """[(neighbour_id, distance), ...] closest first"""
+        row_ids = self.neighbours[job_id][:limit]
+        row_distances = self.distances[job_id][:limit]
+        return [(int(i), float(d)) for i, d in zip(row_ids, row_distances) if i >= 0]
+
+    def save(self, path: str):
+        np.savez(path, neighbours=self.neighbours, distances=self.distances)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SimilarJobsTable"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["neighbours"], data["distances"])
@@ -0,0 +1,195 @@
+# chatgpt_clone/rag/two_stage.py
+"""
+Two-Stage Index - Fast low-dimensional search + exact full-dimension re-rank
+
+Stage 1: FAISS search over REDUCED vectors (e.g. 256 dims instead of 1536)
+         → shortlist of k * oversample candidates, ~6x less work per query
+Stage 2: exact L2 re-rank of the shortlist with the FULL vectors, read from a
+         memory-mapped .npy file (only the shortlisted rows are touched)
+
+Reduction methods:
+- truncate: keep the first N dims and re-normalize (Matryoshka-style;
+            text-embedding-3 models are trained so prefixes stay meaningful)
+- pca:      project onto the top N principal components of the corpus
+"""
+
+import time
+import numpy as np
+from typing import Dict, Optional
+
+
+class VectorReducer:
+    """Maps full vectors → first-stage vectors. Persisted next to the index."""
+
+    def __init__(self, method: str, dim: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None):
+        if method not in ("truncate", "pca"):
+            raise ValueError(f"Unknown reduction method '{method}' (use 'truncate' or 'pca')")
+        self.method = method
+        self.dim = int(dim)
+        self.mean = mean
+        self.components = components  # (dim, full_dim) for pca
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, method: str, dim: int) -> "VectorReducer":
+        dim = min(int(dim), vectors.shape[1])
+        if method != "pca":
+            return cls(method, dim)
+
+        # Top principal components from the (full_dim x full_dim) covariance
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+        covariance = centered.T @ centered / max(len(vectors) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        top = np.argsort(eigenvalues)[::-1][:dim]
+        components = eigenvectors[:, top].T.astype("float32")
+        return cls(method, dim, mean.astype("float32"), components)
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype="float32")
+        if self.method == "pca":
+            return np.ascontiguousarray((vectors - self.mean) @ self.components.T, dtype="float32")
+
+        truncated = vectors[:, :self.dim]
+        norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+        return np.ascontiguousarray(truncated / np.maximum(norms, 1e-12), dtype="float32")
+
+    def save(self, path: str):
+        arrays = {"method": np.array(self.method), "dim": np.array(self.dim)}
+        if self.method == "pca":
+            arrays.update(mean=self.mean, components=self.components)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorReducer":
+        with np.load(path) as data:
+            method = str(data["method"])
+            return cls(
+                method,
+                int(data["dim"]),
+                data["mean"] if method == "pca" else None,
+                data["components"] if method == "pca" else None,
+            )
+
+
+def vectors_path(index_path: str) -> str:
+    return index_path.replace(".index", ".vectors.npy")
+
+
+def reducer_path(index_path: str) -> str:
+    return index_path.replace(".index", ".reducer.npz")
+
+
+class TwoStageIndex:
+    """
+    Drop-in for a FAISS index (`search`, `ntotal`, `d`, `reconstruct_n`),
+    so /chat and JobAgent keep passing full-dimension query vectors.
+    """
+
+    def __init__(self, first_stage, reducer: VectorReducer, full_vectors: np.ndarray, oversample: int = 4):
+        self.first_stage = first_stage
+        self.reducer = reducer
+        self.full_vectors = full_vectors
+        self.oversample = max(1, int(oversample))
+
+    @property
+    def ntotal(self) -> int:
+        return self.first_stage.ntotal
+
+    @property
+    def d(self) -> int:
+        return self.full_vectors.shape[1]
+
+    def reconstruct_n(self, start: int, n: int) -> np.ndarray:
+        return np.asarray(self.full_vectors[start:start + n], dtype="float32")
+
+    def search(self, queries: np.ndarray, k: int):
+        queries = np.asarray(queries, dtype="float32")
+        shortlist_k = min(self.ntotal, k * self.oversample)
+        _, shortlist = self.first_stage.search(self.reducer.transform(queries), shortlist_k)
+
+        # Same output contract as faiss: squared L2 distances, -1 padding
+        D = np.full((len(queries), k), np.inf, dtype="float32")
+        I = np.full((len(queries), k), -1, dtype="int64")
+        for row, (query, ids) in enumerate(zip(queries, shortlist)):
+            ids = ids[ids >= 0]
+            if not len(ids):
+                continue
+            # Sorted ids → sequential reads from the memory-mapped file
+            ids = np.sort(ids)
+            candidates = np.asarray(self.full_vectors[ids], dtype="float32")
+            distances = ((candidates - query) ** 2).sum(axis=1)
+            best = np.argsort(distances, kind="stable")[:k]
+            D[row, :len(best)] = distances[best]
+            I[row, :len(best)] = ids[best]
+        return D, I
+
+
+def build_first_stage(vectors: np.ndarray, method: str, dim: int):
+    """Fit the reducer and build the low-dimensional FAISS index"""
+    import faiss
+
+    reducer = VectorReducer.fit(vectors, method, dim)
+    reduced = reducer.transform(vectors)
+    index = faiss.IndexFlatL2(reduced.shape[1])
+    index.add(reduced)
+    return index, reducer
+
+
+def load_two_stage_index(first_stage, index_path: str, settings: Dict) -> TwoStageIndex:
+    return TwoStageIndex(
+        first_stage,
+        VectorReducer.load(reducer_path(index_path)),
+        np.load(vectors_path(index_path), mmap_mode="r"),
+        settings.get("oversample", 4),
+    )
+
+
+def compare_with_flat(two_stage: TwoStageIndex, vectors: np.ndarray, k: int = 10,
+                      num_queries: int = 200, seed: int = 0,
+                      query_vectors: Optional[np.ndarray] = None) -> Dict:
+    """
+    Latency / recall@k of the two-stage index vs exact full-dimension search
+
+    - query_vectors given (e.g. real user queries embedded with the index's
+      backend): those are the queries
+    - otherwise leave-one-out: sampled corpus vectors are the queries and each
+      one's own row is dropped from both result lists (a query that IS an
+      indexed row would make its top hit trivially right)
+    """
+    import faiss
+
+    if query_vectors is not None and len(query_vectors):
+        queries = np.asarray(query_vectors, dtype="float32")[:num_queries]
+        exclude = [None] * len(queries)
+        method = "queries"
+    else:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+        queries = np.asarray(vectors[sample], dtype="float32")
+        exclude = [int(i) for i in sample]
+        method = "leave_one_out"
+    k = min(k, len(vectors) - (1 if method == "leave_one_out" else 0))
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(np.ascontiguousarray(vectors, dtype="float32"))
+
+    def timed(index):
+        start = time.perf_counter()
+        # One extra result so there are still k left after dropping the query's own row
+        results = [index.search(q[None, :], k + 1)[1][0] for q in queries]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        return [[i for i in ids if i >= 0 and i != skip][:k] for ids, skip in zip(results, exclude)], elapsed_ms
+
+    exact, flat_ms = timed(flat)
+    approx, two_stage_ms = timed(two_stage)
+    recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx, exact)])
+
+    return {
+        "k": k,
+        "method": method,
+        "queries": len(queries),
+        "flat_ms_per_query": flat_ms,
+        "two_stage_ms_per_query": two_stage_ms,
+        "recall_at_k": float(recall),
+    }
@@ -0,0 +1,33 @@
+# chatgpt_clone/rag/visa.py
+"""
+Visa Sponsorship - One reading of the scraped `visa_sponsorship` field
+"Yes", "Sponsorship available" → True; "No", "Not available", "No sponsorship",
+"unknown", False → False. Used by JobAgent's visa filter, profile re-ranking
+and the salary cube's sponsorship rate.
+"""
+
+import re
+
+_POSITIVE_WORDS = {"yes", "true", "available", "offered", "provided", "sponsor", "sponsors",
+                   "sponsored", "sponsorship", "sponsoring"}
+# Any of these flips the answer: "not available", "no sponsorship", "cannot sponsor"
+_NEGATION_WORDS = {"no", "not", "none", "never", "false", "without", "unavailable", "cannot",
+                   "can't", "won't", "unable", "isn't", "doesn't", "don't", "n/a"}
+_WORD_PATTERN = re.compile(r"[a-z/']+")
+
+
+def offers_visa_sponsorship(value) -> bool:
+    """
+    Does the job's visa_sponsorship value say sponsorship is offered?
+
+    Examples:
+    - "Yes" / "Sponsorship available" / True  → True
+    - "No" / "Not available" / "No sponsorship" / "We cannot sponsor"  → False
+    - "unknown" / "" / None / False  → False
+    """
+    if isinstance(value, bool):
+        return value
+    words = set(_WORD_PATTERN.findall(str(value or "").lower()))
+    if words & _NEGATION_WORDS:
+        return False
+    return bool(words & _POSITIVE_WORDS)
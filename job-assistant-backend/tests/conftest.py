@@ -0,0 +1,59 @@
+# chatgpt_clone/tests/conftest.py
+"""
+Shared fixtures. Run from job-assistant-backend/:  python -m pytest tests
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+import pytest
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest.mock_openai import create_app  # noqa: E402
+from rag.openai_client import SharedOpenAIClient  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """
+    Factory: start loadtest.mock_openai on a free port with the given settings
+    and return (stub stats dict, SharedOpenAIClient pointed at it).
+    Set OPENAI_* env vars with monkeypatch BEFORE calling it.
+    """
+    servers = []
+
+    def start(**settings):
+        settings.setdefault("dim", 8)
+        settings.setdefault("embed_latency_ms", 0)
+        settings.setdefault("chat_latency_ms", 0)
+        settings.setdefault("completion_tokens", 0)
+        app = create_app(**settings)
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 10
+        while not server.started:
+            assert time.monotonic() < deadline, "stub server did not start"
+            time.sleep(0.01)
+        servers.append((server, thread))
+
+        monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+        monkeypatch.setenv("OPENAI_API_KEY", "stub-key")
+        return app.state.stats, SharedOpenAIClient()
+
+    yield start
+
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(timeout=5)
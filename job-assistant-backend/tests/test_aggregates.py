@@ -0,0 +1,110 @@
+# chatgpt_clone/tests/test_aggregates.py
+"""
+SalaryCube: extend() must equal a full build, save/load must round-trip,
+and stats() must match a direct computation over the jobs
+"""
+
+import random
+import numpy as np
+import pytest
+from rag.aggregates import SalaryCube, format_comparison
+
+SKILLS = ["Python", "Java", "AWS", "React", "Go"]
+CITIES = ["London, UK", "Manchester, UK", "Leeds", "Remote", "Fully remote (UK)", ""]
+SALARIES = ["£40K-£50K", "£60,000", "£500 per day", "£30 per hour", "Not specified", "", "Competitive"]
+VISAS = ["Yes", "No", "Not available", "Sponsorship available", "unknown", False, True]
+
+
+@pytest.fixture(scope="module")
+def jobs():
+    rng = random.Random(0)
+    return [
+        {
+            "tech_stack": rng.sample(SKILLS, rng.randint(0, 3)),
+            "location": rng.choice(CITIES),
+            "salary": rng.choice(SALARIES),
+            "visa_sponsorship": rng.choice(VISAS),
+        }
+        for _ in range(400)
+    ]
+
+
+def assert_same_cells(cube, other):
+    assert cube.num_jobs == other.num_jobs
+    assert set(cube.cells) == set(other.cells)
+    for cell, values in cube.cells.items():
+        assert values["count"] == other.cells[cell]["count"], cell
+        assert values["visa"] == other.cells[cell]["visa"], cell
+        np.testing.assert_array_equal(values["salaries"], other.cells[cell]["salaries"])
+
+
+@pytest.mark.parametrize("steps", [(0, 400), (1, 400), (150, 400), (50, 51, 200, 400)])
+def test_extend_matches_build(jobs, steps):
+    cube = SalaryCube()
+    for end in steps:
+        cube = cube.extend(jobs[:end])
+
+    assert_same_cells(cube, SalaryCube.build(jobs))
+
+
+def test_extend_without_new_jobs_is_a_no_op(jobs):
+    cube = SalaryCube.build(jobs)
+    assert cube.extend(jobs) is cube
+
+
+def test_save_load_round_trip(jobs, tmp_path):
+    cube = SalaryCube.build(jobs)
+    path = str(tmp_path / "faiss.aggregates.npz")
+    cube.save(path)
+    loaded = SalaryCube.load(path)
+
+    assert_same_cells(loaded, cube)
+    assert loaded.compare(["python", "java"], ["london", None]) == cube.compare(["python", "java"], ["london", None])
+    assert SalaryCube.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_round_tripped_cube_extends_like_a_fresh_one(jobs, tmp_path):
+    path = str(tmp_path / "faiss.aggregates.npz")
+    SalaryCube.build(jobs[:300]).save(path)
+
+    assert_same_cells(SalaryCube.load(path).extend(jobs), SalaryCube.build(jobs))
+
+
+def test_file_from_an_older_cube_version_is_not_loaded(jobs, tmp_path):
+    path = str(tmp_path / "faiss.aggregates.npz")
+    SalaryCube.build(jobs).save(path)
+    with np.load(path) as data:
+        legacy = {name: data[name] for name in data.files if name != "version"}
+    np.savez(path, **legacy)
+
+    assert SalaryCube.load(path) is None
+
+
+def test_stats_for_a_small_corpus():
+    jobs = [
+        {"tech_stack": ["Python"], "location": "London, UK", "salary": "£40K-£60K", "visa_sponsorship": "Yes"},
+        {"tech_stack": ["python", "AWS"], "location": "London", "salary": "£70,000", "visa_sponsorship": "Not available"},
+        {"tech_stack": ["Python"], "location": "Manchester, UK", "salary": "Competitive", "visa_sponsorship": "No sponsorship"},
+        {"tech_stack": ["Java"], "location": "Remote - UK", "salary": "£500 per day", "visa_sponsorship": True},
+    ]
+    cube = SalaryCube.build(jobs)
+
+    python_london = cube.stats("Python", "London")
+    assert python_london["jobs"] == 2
+    assert python_london["jobs_with_salary"] == 2
+    assert python_london["salary"]["median"] == 60000  # midpoints 50000 and 70000
+    assert python_london["visa_sponsorship_rate"] == 0.5  # "Not available" is not sponsoring
+
+    python_all = cube.stats("python")
+    assert python_all["jobs"] == 3
+    assert python_all["jobs_with_salary"] == 2
+    assert python_all["visa_sponsorship_rate"] == pytest.approx(1 / 3)
+
+    assert cube.stats(location="remote")["jobs"] == 1
+    assert cube.stats()["jobs"] == 4
+    assert cube.stats("Rust")["jobs"] == 0
+    assert cube.stats("Rust")["salary"] is None
+
+    lines = format_comparison(cube.compare(["python", "rust"], ["london"])).splitlines()
+    assert lines[0].startswith("- python in london: median £60,000")
+    assert lines[1] == "- rust in london: no jobs"
@@ -0,0 +1,124 @@
+# chatgpt_clone/tests/test_job_agent.py
+"""
+JobAgent's adaptive candidate expansion against small in-memory indexes:
+an exact one, one whose shortlist reorders as k grows (like TwoStageIndex)
+and one that loses a shard on the first search (like ShardedIndex)
+"""
+
+import numpy as np
+from rag.job_agent import JobAgent
+
+NUM_JOBS = 200
+DIM = 8
+
+
+def make_jobs(sponsor_every: int = 10):
+    return [
+        {
+            "id": i,
+            "title": f"Graduate Engineer {i}",
+            "company": f"Company {i}",
+            "salary": "£40K",
+            "location": "London, UK",
+            "description": "Graduate role",
+            "visa_sponsorship": "Yes" if i % sponsor_every == 0 else "No",
+        }
+        for i in range(NUM_JOBS)
+    ]
+
+
+class ExactIndex:
+    """Brute-force L2 over random vectors - results are a stable prefix as k grows"""
+
+    def __init__(self, num_jobs: int = NUM_JOBS):
+        self.vectors = np.random.default_rng(0).normal(size=(num_jobs, DIM)).astype("float32")
+        self.ntotal = num_jobs
+        self.d = DIM
+        self.calls = []
+
+    def search(self, queries, k):
+        self.calls.append(k)
+        distances = ((self.vectors[None, :, :] - queries[:, None, :]) ** 2).sum(axis=2)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), order.astype("int64")
+
+
+class ReorderingIndex(ExactIndex):
+    """A different top-k for every k (approximate first stage)"""
+
+    def search(self, queries, k):
+        self.calls.append(k)
+        ids = np.random.default_rng(k).permutation(self.ntotal)[:k]
+        return np.zeros((1, k), dtype="float32"), ids[None, :].astype("int64")
+
+
+class LostShardIndex(ExactIndex):
+    """First search misses every even job id (one shard timed out), later ones are complete"""
+
+    def search(self, queries, k):
+        D, I = super().search(queries, k)
+        if len(self.calls) == 1:
+            I = np.where(I % 2 == 0, -1, I)
+        return D, I
+
+
+def make_agent(index, jobs):
+    return JobAgent(index, jobs, embed_fn=lambda text: [0.0] * DIM, initial_k=20, growth=2)
+
+
+def assert_unique(jobs):
+    ids = [job["id"] for job in jobs]
+    assert len(ids) == len(set(ids))
+
+
+def test_broad_query_stops_after_one_search():
+    index = ExactIndex()
+    result = make_agent(index, make_jobs(sponsor_every=1)).search("graduate engineer visa sponsorship", top_k=10)
+
+    assert result["total_results"] == 10
+    assert index.calls == [20]
+    assert result["search_stats"]["stopped"] == "enough_results"
+
+
+def test_selective_query_widens_until_enough_results():
+    index = ExactIndex()
+    result = make_agent(index, make_jobs(sponsor_every=10)).search("graduate engineer visa sponsorship", top_k=15)
+
+    assert result["total_results"] == 15
+    assert index.calls == [20, 40, 80, 160]
+    assert all(job["visa_sponsorship"] == "Yes" for job in result["jobs"])
+    assert_unique(result["jobs"])
+
+
+def test_reordered_shortlist_yields_unique_jobs():
+    jobs = make_jobs(sponsor_every=10)
+    index = ReorderingIndex()
+    result = make_agent(index, jobs).search("graduate engineer visa sponsorship", top_k=30)
+
+    # Every sponsoring job reachable by the last (full) search is found exactly once
+    assert index.calls[-1] == NUM_JOBS
+    assert result["total_results"] == NUM_JOBS // 10
+    assert_unique(result["jobs"])
+    assert result["search_stats"]["candidates_examined"] == NUM_JOBS
+
+
+def test_jobs_missed_by_a_lost_shard_are_examined_later():
+    index = LostShardIndex()
+    result = make_agent(index, make_jobs(sponsor_every=2)).search("graduate engineer visa sponsorship", top_k=20)
+
+    # The first search only returned odd (non-sponsoring) ids; the nearest
+    # even ones must still be picked up once the shard answers again
+    _, exact = ExactIndex().search(np.zeros((1, DIM), dtype="float32"), NUM_JOBS)
+    nearest_sponsoring = [int(i) for i in exact[0] if i % 2 == 0][:20]
+    assert len(index.calls) > 1
+    assert sorted(job["id"] for job in result["jobs"]) == sorted(nearest_sponsoring)
+    assert_unique(result["jobs"])
+
+
+def test_small_index_is_exhausted():
+    index = ExactIndex(num_jobs=30)
+    result = make_agent(index, make_jobs(sponsor_every=10)[:30]).search("graduate engineer visa sponsorship", top_k=10)
+
+    assert result["total_results"] == 3
+    assert index.calls == [20, 30]
+    assert result["search_stats"]["stopped"] == "exhausted"
@@ -0,0 +1,175 @@
+# chatgpt_clone/tests/test_openai_client.py
+"""
+SharedOpenAIClient against the local stub server (loadtest/mock_openai.py):
+coalescing, 429 back-off, token-bucket throttling and deadlines
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from rag.openai_client import DeadlineExceeded, TokenBucket
+
+CHAT = {"model": "gpt-4o", "messages": [{"role": "user", "content": "python jobs"}]}
+
+
+@pytest.fixture(autouse=True)
+def default_limits(monkeypatch):
+    monkeypatch.setenv("OPENAI_RPS", "1000")
+    monkeypatch.delenv("OPENAI_BURST", raising=False)
+    monkeypatch.setenv("OPENAI_MAX_RETRIES", "4")
+
+
+# ==========================================
+# SINGLE-FLIGHT
+# ==========================================
+
+def test_identical_concurrent_requests_share_one_upstream_call(openai_stub):
+    stub_stats, client = openai_stub(embed_latency_ms=300)
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: client.create_embedding("python jobs"), range(10)))
+
+    assert stub_stats["embeddings"] == 1
+    assert client.stats["upstream_calls"] == 1
+    assert client.stats["coalesced_calls"] == 9
+    assert all(r.data[0].embedding == results[0].data[0].embedding for r in results)
+
+
+def test_different_requests_are_not_coalesced(openai_stub):
+    stub_stats, client = openai_stub(embed_latency_ms=100)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(client.create_embedding, ["a", "b", "c", "d"]))
+
+    assert stub_stats["embeddings"] == 4
+    assert client.stats["coalesced_calls"] == 0
+
+
+# ==========================================
+# 429 BACK-OFF
+# ==========================================
+
+def test_rate_limit_retry_waits_for_retry_after(openai_stub):
+    stub_stats, client = openai_stub(rate_limit_first=1, retry_after=0.6)
+
+    started = time.monotonic()
+    client.create_embedding("python jobs")
+    elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.6
+    assert client.stats["rate_limited"] == 1
+    assert client.stats["retries"] == 1
+    assert client.stats["upstream_calls"] == 2
+    assert stub_stats["embeddings"] == 1
+
+
+def test_rate_limit_pauses_other_requests_too(openai_stub):
+    _, client = openai_stub(rate_limit_first=1, retry_after=0.6)
+
+    started = time.monotonic()
+    first = threading.Thread(target=client.create_embedding, args=("a",))
+    first.start()
+    time.sleep(0.2)  # "a" has been rate limited by now - the shared pause is active
+    client.create_embedding("b")
+    first.join()
+
+    assert time.monotonic() - started >= 0.55
+
+
+def test_gives_up_after_max_retries(openai_stub, monkeypatch):
+    import openai
+
+    monkeypatch.setenv("OPENAI_MAX_RETRIES", "1")
+    _, client = openai_stub(rate_limit_first=5, retry_after=0.05)
+
+    with pytest.raises(openai.RateLimitError):
+        client.create_embedding("python jobs")
+    assert client.stats["upstream_calls"] == 2
+
+
+# ==========================================
+# TOKEN BUCKET
+# ==========================================
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=10, capacity=3)
+
+    started = time.monotonic()
+    waits = [bucket.acquire() for _ in range(5)]
+    elapsed = time.monotonic() - started
+
+    assert waits[:3] == [0.0, 0.0, 0.0]  # Burst
+    assert elapsed >= 0.18                # 2 more tokens at 10/s
+
+
+def test_client_is_throttled_to_openai_rps(openai_stub, monkeypatch):
+    monkeypatch.setenv("OPENAI_RPS", "5")
+    monkeypatch.setenv("OPENAI_BURST", "1")
+    _, client = openai_stub()
+
+    started = time.monotonic()
+    for text in ["a", "b", "c", "d"]:
+        client.create_embedding(text)
+
+    assert time.monotonic() - started >= 0.55  # 3 waits of 0.2 s
+    assert client.stats["throttle_wait_seconds"] >= 0.5
+
+
+# ==========================================
+# DEADLINES
+# ==========================================
+
+def test_token_bucket_refuses_to_wait_past_deadline():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        bucket.acquire(deadline=time.monotonic() + 0.1)
+    assert time.monotonic() - started < 0.1  # Fails fast instead of sleeping
+
+
+def test_timeout_bounds_a_slow_call(openai_stub):
+    _, client = openai_stub(chat_latency_ms=1500)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.create_chat_completion(timeout=0.3, **CHAT)
+
+    assert time.monotonic() - started < 0.8
+    assert client.stats["deadline_exceeded"] == 1
+
+
+def test_timeout_covers_retry_after(openai_stub):
+    _, client = openai_stub(rate_limit_first=1, retry_after=5)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.create_chat_completion(timeout=1.0, **CHAT)
+
+    assert time.monotonic() - started < 0.5  # Doesn't sleep 5 s only to miss the deadline
+    assert client.stats["retries"] == 0
+
+
+def test_coalesced_caller_with_later_deadline_retries_on_its_own(openai_stub):
+    stub_stats, client = openai_stub(chat_latency_ms=800)
+    outcomes = {}
+
+    def call(name, timeout):
+        try:
+            outcomes[name] = client.create_chat_completion(timeout=timeout, **CHAT)
+        except DeadlineExceeded as e:
+            outcomes[name] = e
+
+    short = threading.Thread(target=call, args=("short", 0.3))
+    long = threading.Thread(target=call, args=("long", 5.0))
+    short.start()
+    time.sleep(0.05)  # "long" joins the in-flight call started by "short"
+    long.start()
+    short.join()
+    long.join()
+
+    assert isinstance(outcomes["short"], DeadlineExceeded)
+    assert outcomes["long"].choices[0].message.content
+    assert stub_stats["chat_completions"] == 2
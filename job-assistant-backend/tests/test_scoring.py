@@ -0,0 +1,98 @@
+# chatgpt_clone/tests/test_scoring.py
+"""
+CandidateScorer must give exactly the scores of the per-job loop /chat used before
+"""
+
+import random
+import numpy as np
+import pytest
+from rag.scoring import COMMON_TECHS, UK_CITIES, CandidateScorer, ScoringWeights
+
+LOCATIONS = ["London, UK", "Manchester, UK", "Greater Manchester", "Leeds, UK", "Remote", "Cambridge, UK", ""]
+TITLES = ["Senior Python Developer", "Backend Engineer", "Graduate Software Engineer",
+          "Data Engineer (Spark)", "Java Developer", "Full-Stack Engineer - React/Node"]
+COMPANIES = ["Monzo", "Deliveroo", "Python Software Ltd", "Engineering Co", "Ocado Technology"]
+QUERIES = [
+    "python jobs in manchester",
+    "Senior backend engineer with AWS and Kubernetes",
+    "java developer leeds or london",
+    "graduate software engineer",
+    "react typescript node jobs in cambridge",
+    "c++ and c# roles",
+    "jobs",
+]
+
+
+def loop_score(job, query):
+    """The pre-vectorization /chat loop, verbatim apart from the function wrapper"""
+    user_input_lower = query.lower()
+    location_keywords = [city for city in UK_CITIES if city in user_input_lower]
+    tech_keywords = [tech for tech in COMMON_TECHS if tech in user_input_lower]
+
+    score = 0
+    job_location = job.get('location', '').lower()
+    job_tech_stack = [t.lower() for t in job.get('tech_stack', [])]
+    job_title = job.get('title', '').lower()
+    job_company = job.get('company', '').lower()
+
+    if location_keywords:
+        if any(keyword in job_location for keyword in location_keywords):
+            score += 100
+        elif 'london' in job_location and 'london' not in location_keywords:
+            score -= 50
+
+    if tech_keywords:
+        matching_techs = sum(1 for tech in tech_keywords if tech in ' '.join(job_tech_stack))
+        score += matching_techs * 10
+
+    query_words = [w for w in user_input_lower.split() if len(w) > 3]
+    for word in query_words:
+        if word in job_title:
+            score += 5
+        if word in job_company:
+            score += 3
+    return score
+
+
+@pytest.fixture(scope="module")
+def jobs():
+    rng = random.Random(0)
+    return [
+        {
+            "title": rng.choice(TITLES),
+            "company": rng.choice(COMPANIES),
+            "location": rng.choice(LOCATIONS),
+            "tech_stack": rng.sample(["Python", "AWS", "Kubernetes", "Java", "React", "Node.js",
+                                      "TypeScript", "C++", "PostgreSQL", "Go"], rng.randint(0, 4)),
+        }
+        for _ in range(300)
+    ]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_matches_per_job_loop_over_whole_corpus(jobs, query):
+    scores = CandidateScorer(jobs).score(query)
+    expected = np.array([loop_score(job, query) for job in jobs], dtype="float32")
+    np.testing.assert_array_equal(scores, expected)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_candidate_scores_follow_candidate_order(jobs, query):
+    candidate_ids = np.random.default_rng(1).choice(len(jobs), size=40, replace=False)
+    scores = CandidateScorer(jobs).score(query, candidate_ids)
+    expected = np.array([loop_score(jobs[i], query) for i in candidate_ids], dtype="float32")
+    np.testing.assert_array_equal(scores, expected)
+
+
+def test_weights_can_be_overridden_from_env(jobs, monkeypatch):
+    monkeypatch.setenv("SCORING_LOCATION_MATCH", "7")
+    scorer = CandidateScorer(jobs, ScoringWeights.from_env())
+    job_ids = [i for i, job in enumerate(jobs) if "manchester" in job["location"].lower()]
+
+    scores = scorer.score("manchester", job_ids)
+    assert scorer.weights.location_match == 7
+    assert set(scores.tolist()) == {7.0}
+
+
+def test_empty_corpus():
+    assert CandidateScorer([]).score("python jobs in leeds").shape == (0,)
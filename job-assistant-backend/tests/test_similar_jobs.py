@@ -0,0 +1,83 @@
+# chatgpt_clone/tests/test_similar_jobs.py
+"""
+SimilarJobsTable: an extended table must be the table a full build would give
+
+Vectors are small integers, so squared distances are integers that float16
+stores exactly - tied neighbours may come back in a different order, but each
+row's k nearest distances must be identical.
+"""
+
+import numpy as np
+import pytest
+from rag.similar_jobs import SimilarJobsTable
+
+K = 5
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(0).integers(0, 8, size=(300, 4)).astype("float32")
+
+
+def assert_valid_neighbours(table, vectors):
+    """Every stored (neighbour, distance) is real: not self, and the distance is exact"""
+    for row in range(table.num_jobs):
+        ids = table.neighbours[row]
+        assert row not in ids
+        expected = ((vectors[ids] - vectors[row]) ** 2).sum(axis=1)
+        np.testing.assert_array_equal(table.distances[row].astype("float32"), expected)
+
+
+def test_build_finds_exact_neighbours(vectors):
+    table = SimilarJobsTable.build(vectors, K)
+
+    assert table.neighbours.shape == (len(vectors), K)
+    assert_valid_neighbours(table, vectors)
+    all_distances = ((vectors[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    np.fill_diagonal(all_distances, np.inf)
+    expected = np.sort(all_distances, axis=1)[:, :K]
+    np.testing.assert_array_equal(table.distances.astype("float32"), expected)
+
+
+@pytest.mark.parametrize("old_count", [0, 1, 100, 299])
+def test_extend_matches_build(vectors, old_count):
+    built = SimilarJobsTable.build(vectors, K)
+    extended = SimilarJobsTable.build(vectors[:old_count], K) if old_count else SimilarJobsTable(
+        np.zeros((0, K), dtype="int32"), np.zeros((0, K), dtype="float16"))
+    extended = extended.extend(vectors)
+
+    assert extended.num_jobs == len(vectors)
+    assert_valid_neighbours(extended, vectors)
+    np.testing.assert_array_equal(extended.distances, built.distances)
+
+
+def test_extend_in_several_steps(vectors):
+    table = SimilarJobsTable.build(vectors[:50], K)
+    for end in (120, 121, 300):
+        table = table.extend(vectors[:end])
+
+    np.testing.assert_array_equal(table.distances, SimilarJobsTable.build(vectors, K).distances)
+
+
+def test_extend_without_new_jobs_is_a_no_op(vectors):
+    table = SimilarJobsTable.build(vectors, K)
+    assert table.extend(vectors) is table
+
+
+def test_tiny_corpus_pads_missing_neighbours():
+    table = SimilarJobsTable.build(np.eye(3, dtype="float32"), K)
+
+    assert table.lookup(0) == [(1, 2.0), (2, 2.0)]
+    assert (table.neighbours[:, 2:] == -1).all()
+
+
+def test_save_load_round_trip(vectors, tmp_path):
+    table = SimilarJobsTable.build(vectors, K)
+    path = str(tmp_path / "faiss.knn.npz")
+    table.save(path)
+    loaded = SimilarJobsTable.load(path)
+
+    np.testing.assert_array_equal(loaded.neighbours, table.neighbours)
+    np.testing.assert_array_equal(loaded.distances, table.distances)
+    assert loaded.lookup(42, 3) == table.lookup(42, 3)
+    assert SimilarJobsTable.load(str(tmp_path / "missing.npz")) is None
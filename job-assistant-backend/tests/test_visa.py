@@ -0,0 +1,23 @@
+# chatgpt_clone/tests/test_visa.py
+"""
+offers_visa_sponsorship: the one visa heuristic shared by JobAgent,
+profile re-ranking and the salary cube
+"""
+
+import pytest
+from rag.visa import offers_visa_sponsorship
+
+
+@pytest.mark.parametrize("value", [
+    "Yes", "yes - Skilled Worker", "Sponsorship available", "Visa sponsorship offered", "We sponsor visas", True,
+])
+def test_sponsoring_values(value):
+    assert offers_visa_sponsorship(value)
+
+
+@pytest.mark.parametrize("value", [
+    "No", "Not available", "No sponsorship", "Sponsorship not available", "We cannot sponsor",
+    "Unavailable", "N/A", "unknown", "", None, False,
+])
+def test_non_sponsoring_values(value):
+    assert not offers_visa_sponsorship(value)
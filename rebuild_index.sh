@@ -6,18 +6,18 @@
 echo "🔄 Rebuilding FAISS index with optimized embeddings..."
 echo ""
 
-# Navigate to the rag directory
-cd "$(dirname "$0")/chatgpt_clone/rag"
+# Navigate to the backend directory (build_index runs as the rag.build_index module)
+cd "$(dirname "$0")/job-assistant-backend"
 
 # Check if jobs_raw directory exists
-if [ ! -d "../../jobs_raw" ]; then
+if [ ! -d "../jobs_raw" ]; then
     echo "❌ Error: jobs_raw directory not found!"
-    echo "   Expected location: $(pwd)/../../jobs_raw"
+    echo "   Expected location: $(pwd)/../jobs_raw"
     exit 1
 fi
 
 # Count job files
-JOB_COUNT=$(ls -1 ../../jobs_raw/*.json 2>/dev/null | wc -l | tr -d ' ')
+JOB_COUNT=$(ls -1 ../jobs_raw/*.json 2>/dev/null | wc -l | tr -d ' ')
 echo "📊 Found $JOB_COUNT job files in jobs_raw/"
 
 if [ "$JOB_COUNT" -eq 0 ]; then
@@ -35,7 +35,7 @@ echo "   ✅ Save to vector_index/"
 echo ""
 
 # Run the build script
-python build_index.py
+python -m rag.build_index
 
 # Check if successful
 if [ $? -eq 0 ]; then
@@ -43,7 +43,7 @@ if [ $? -eq 0 ]; then
     echo "✅ Index rebuild complete!"
     echo ""
     echo "📦 Generated files:"
-    ls -lh ../../vector_index/
+    ls -lh ../vector_index/
     echo ""
     echo "🎯 Next steps:"
     echo "   1. Start backend: ./run_backend.sh"